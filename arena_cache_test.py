@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from arena_game_service import ArenaGameService
+from response_cache import ResponseCache
+
+CATALOG = {"data": [{"id": "shield", "price": 10}]}
+
+
+class FakeArena:
+    """In-process stand-in for the arena API that counts what reaches it."""
+
+    def __init__(self):
+        self.requests = []
+        self.not_modified = 0
+        self.version = 1
+        # While set, game details responses are built and then held until it is released
+        self.hold: Optional[threading.Event] = None
+        self.held = threading.Event()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                outer.requests.append(self.path)
+                if self.path == "/items/catalog":
+                    body, etag = CATALOG, f'"catalog-{outer.version}"'
+                elif self.path.startswith("/games/"):
+                    game_id = self.path.rsplit("/", 1)[1]
+                    body, etag = {"data": {"gameId": game_id, "version": outer.version}}, f'"game-{outer.version}"'
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if outer.hold is not None and self.path.startswith("/games/"):
+                    outer.held.set()
+                    outer.hold.wait(5)
+                if self.headers.get("If-None-Match") == etag:
+                    outer.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                # Any write changes the game
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                outer.requests.append(self.path)
+                outer.version += 1
+                payload = b'{"data": {}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_service(server, **cache_args):
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock, **cache_args)
+    arena = ArenaGameService(base_api_url=server.url, cache=cache)
+    return arena, cache, clock
+
+
+def wait_for_revalidations(arena):
+    deadline = time.monotonic() + 5
+    while arena.revalidations and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_hits_skip_the_network():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server)
+        for _ in range(5):
+            result = arena.get_items_catalog()
+            assert result.success and result.data == CATALOG["data"]
+        assert server.requests == ["/items/catalog"]
+        assert (cache.stats.misses, cache.stats.hits) == (1, 4)
+    finally:
+        server.close()
+
+
+def test_keys_include_arguments():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server)
+        assert arena.get_game_details("a").data["gameId"] == "a"
+        assert arena.get_game_details("b").data["gameId"] == "b"
+        assert arena.get_game_details("a").data["gameId"] == "a"
+        assert server.requests == ["/games/a", "/games/b"]
+        assert (cache.stats.misses, cache.stats.hits) == (2, 1)
+    finally:
+        server.close()
+
+
+def test_stale_entry_is_served_and_revalidated_in_background():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server, ttls={"game_details": 5.0}, stale_ttl=60.0)
+        arena.get_game_details("a")
+        clock.now = 10.0
+        server.version = 2
+        # Past the TTL but inside the stale window: the old copy comes back at once
+        assert arena.get_game_details("a").data["version"] == 1
+        wait_for_revalidations(arena)
+        assert cache.stats.stale_hits == 1
+        assert arena.get_game_details("a").data["version"] == 2
+        assert cache.stats.hits == 1
+        assert server.requests == ["/games/a", "/games/a"]
+    finally:
+        server.close()
+
+
+def test_unchanged_resource_is_revalidated_with_304():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server, ttls={"items_catalog": 5.0}, stale_ttl=0.0)
+        arena.get_items_catalog()
+        clock.now = 10.0
+        result = arena.get_items_catalog()
+        assert result.success and result.data == CATALOG["data"]
+        assert server.not_modified == 1
+        assert cache.stats.not_modified == 1
+        # The 304 restarted the TTL
+        arena.get_items_catalog()
+        assert (cache.stats.misses, cache.stats.hits) == (2, 1)
+        assert len(server.requests) == 2
+    finally:
+        server.close()
+
+
+def test_lru_eviction_is_bounded():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server, max_entries=2)
+        arena.get_game_details("a")
+        arena.get_game_details("b")
+        arena.get_game_details("a")
+        arena.get_game_details("c")
+        assert list(cache.entries) == [("game_details", "a"), ("game_details", "c")]
+        assert cache.stats.evictions == 1
+        arena.get_game_details("b")
+        assert server.requests == ["/games/a", "/games/b", "/games/c", "/games/b"]
+    finally:
+        server.close()
+
+
+def test_revalidation_in_flight_during_a_write_is_not_stored():
+    server = FakeArena()
+    try:
+        arena, cache, clock = make_service(server, ttls={"game_details": 5.0}, stale_ttl=60.0)
+        arena.get_game_details("a")
+        clock.now = 10.0
+        server.hold = threading.Event()
+        # The background refresh gets its version 1 response, then the write lands before it returns
+        assert arena.get_game_details("a").data["version"] == 1
+        assert server.held.wait(5)
+        assert arena.boost_player("a", "p1", 5, "viewer").success
+        server.hold.set()
+        wait_for_revalidations(arena)
+        assert ("game_details", "a") not in cache.entries
+        server.hold = None
+        assert arena.get_game_details("a").data["version"] == 2
+        arena.disconnect()
+        assert arena._revalidator is None
+    finally:
+        server.close()
+
+
+def test_writes_invalidate_game_details():
+    cache = ResponseCache(clock=FakeClock())
+    cache.store(("game_details", "a"), "cached")
+    cache.invalidate(("game_details", "a"))
+    assert cache.lookup(("game_details", "a")) == (None, "miss")
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
 import socketio  # python-socketio client
 from dotenv import load_dotenv
 
+from command_queue import CommandQueue
+from connection_supervisor import ConnectionSupervisor
+from event_bus import ArenaEvent, EventBus
+from response_cache import ResponseCache
+
 # Load .env from project root
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"), override=False)
 
@@ -22,16 +29,29 @@ class ServiceResult:
     success: bool
     data: Optional[Any] = None
     error: Optional[str] = None
+    # HTTP status of the response, None when the request never got one
+    status: Optional[int] = None
 
 
 class ArenaGameService:
-    def __init__(self, user_token: str = "", *, base_api_url: Optional[str] = None, socket_url: Optional[str] = None, debug: bool = False):
+    def __init__(self, user_token: str = "", *, base_api_url: Optional[str] = None, socket_url: Optional[str] = None, debug: bool = False, cache: Optional[ResponseCache] = None, event_bus: Optional[EventBus] = None):
         self.user_token = user_token
         self.base_api_url = (base_api_url or GAME_API_URL).rstrip("/")
         self.socket_url = (socket_url or ARENA_SERVER_URL)
         self.debug = debug
         self.game_state: Optional[Dict[str, Any]] = None
 
+        # Catalog and game details responses, revalidated in the background once stale
+        self.cache = cache if cache is not None else ResponseCache()
+        self.revalidations: Dict[Tuple, Future] = {}
+        self._revalidation_lock = threading.Lock()
+        self._revalidator: Optional[ThreadPoolExecutor] = None
+
+        # Background sender for bursts of boosts and drops, started on first use
+        self.command_queue: Optional[CommandQueue] = None
+        # Keeps the websocket up once supervise() is called
+        self.supervisor: Optional[ConnectionSupervisor] = None
+
         # HTTP client
         self.session = requests.Session()
         if self.user_token:
@@ -47,6 +67,10 @@ class ArenaGameService:
         # Socket.io client
         self.sio = socketio.Client(logger=self.debug, engineio_logger=self.debug)
 
+        # With an event bus, socket events are queued and the callbacks run from
+        # dispatch_events() on the caller's thread instead of the socket thread
+        self.event_bus = event_bus
+
         # Event callbacks (assign from outside as needed)
         self.on_arena_countdown_started: Optional[Callable[[Any], None]] = None
         self.on_countdown_update: Optional[Callable[[Any], None]] = None
@@ -69,6 +93,8 @@ class ArenaGameService:
         def connect():
             if self.debug:
                 print("[arena] Connected to socket")
+            if self.supervisor:
+                self.supervisor.connection_changed()
 
         @self.sio.event
         def connect_error(err):
@@ -79,70 +105,79 @@ class ArenaGameService:
         def disconnect():
             if self.debug:
                 print("[arena] Disconnected")
+            if self.supervisor:
+                self.supervisor.connection_changed()
 
         # Arena events
         @self.sio.on("arena_countdown_started")
         def _arena_countdown_started(data):
-            if self.on_arena_countdown_started:
-                self.on_arena_countdown_started(data)
+            self._emit("arena_countdown_started", data)
 
         @self.sio.on("countdown_update")
         def _countdown_update(data):
-            if self.on_countdown_update:
-                self.on_countdown_update(data)
+            self._emit("countdown_update", data)
 
         @self.sio.on("arena_begins")
         def _arena_begins(data):
-            if self.on_arena_begins:
-                self.on_arena_begins(data)
+            self._emit("arena_begins", data)
 
         # Boost events
         @self.sio.on("player_boost_activated")
         def _player_boost_activated(data):
-            if self.on_player_boost_activated:
-                self.on_player_boost_activated(data)
+            self._emit("player_boost_activated", data)
 
         @self.sio.on("boost_cycle_update")
         def _boost_cycle_update(data):
-            if self.on_boost_cycle_update:
-                self.on_boost_cycle_update(data)
+            self._emit("boost_cycle_update", data)
 
         @self.sio.on("boost_cycle_complete")
         def _boost_cycle_complete(data):
-            if self.on_boost_cycle_complete:
-                self.on_boost_cycle_complete(data)
+            self._emit("boost_cycle_complete", data)
 
         # Package events
         @self.sio.on("package_drop")
         def _package_drop(data):
-            if self.on_package_drop:
-                self.on_package_drop(data)
+            self._emit("package_drop", data)
 
         @self.sio.on("immediate_item_drop")
         def _immediate_item_drop(data):
-            if self.on_immediate_item_drop:
-                self.on_immediate_item_drop(data)
+            self._emit("immediate_item_drop", data)
 
         # Game events
         @self.sio.on("event_triggered")
         def _event_triggered(data):
-            if self.on_event_triggered:
-                self.on_event_triggered(data)
+            self._emit("event_triggered", data)
 
         @self.sio.on("player_joined")
         def _player_joined(data):
-            if self.on_player_joined:
-                self.on_player_joined(data)
+            self._emit("player_joined", data)
 
         @self.sio.on("game_completed")
         def _game_completed(data):
-            if self.on_game_completed:
-                self.on_game_completed(data)
+            self._emit("game_completed", data)
 
         @self.sio.on("game_stopped")
         def _game_stopped(data):
-            if self.on_game_stopped:
-                self.on_game_stopped(data)
+            self._emit("game_stopped", data)
+
+    def _emit(self, event: str, data: Any) -> None:
+        if self.event_bus is not None:
+            self.event_bus.publish(event, data)
+            return
+        callback = getattr(self, f"on_{event}")
+        if callback:
+            callback(data)
+
+    def _dispatch(self, event: ArenaEvent) -> None:
+        callback = getattr(self, f"on_{event.name}")
+        if callback:
+            callback(event.data)
+
+    def dispatch_events(self, budget: Optional[float] = 0.004, max_events: Optional[int] = None) -> int:
+        # Call once per frame from the game loop, returns the number of events delivered
+        if self.event_bus is None:
+            return 0
+        return self.event_bus.drain(self._dispatch, budget, max_events)
 
     # Helpers
     def _extract_error(self, resp: requests.Response, fallback: str) -> str:
@@ -159,6 +194,56 @@ class ArenaGameService:
             return f"{fallback} (status {resp.status_code}): {snippet}"
         return f"{fallback} (status {resp.status_code})"
 
+    def _cached_get(self, key: Tuple, url: str, fallback: str, timeout: float) -> ServiceResult:
+        entry, state = self.cache.lookup(key)
+        if state == "fresh":
+            return entry.result
+        if state == "stale":
+            # Serve what we have now and refresh it off the caller's thread
+            self._revalidate_in_background(key, url, fallback, timeout)
+            return entry.result
+        return self._conditional_get(key, url, fallback, timeout, entry)
+
+    def _conditional_get(self, key: Tuple, url: str, fallback: str, timeout: float, entry: Any = None) -> ServiceResult:
+        # A write that invalidates the key while this is in flight makes the response unusable
+        generation = self.cache.generation(key)
+        try:
+            headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+            if self.debug:
+                print(f"[arena] GET {url}")
+            resp = self.session.get(url, headers=headers, timeout=timeout)
+            if resp.status_code == 304 and entry is not None:
+                self.cache.touch(key, generation)
+                return entry.result
+            if resp.ok:
+                try:
+                    data = resp.json()
+                except Exception:
+                    data = {"raw": resp.text}
+                result = ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status_code)
+                self.cache.store(key, result, resp.headers.get("ETag"), generation)
+                return result
+            else:
+                return ServiceResult(False, error=self._extract_error(resp, fallback), status=resp.status_code)
+        except requests.RequestException as exc:
+            return ServiceResult(False, error=str(exc))
+
+    def _revalidate_in_background(self, key: Tuple, url: str, fallback: str, timeout: float) -> None:
+        with self._revalidation_lock:
+            # One refresh per key at a time
+            if key in self.revalidations:
+                return
+            if self._revalidator is None:
+                self._revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="arena-revalidate")
+            entry = self.cache.entries.get(key)
+            future = self._revalidator.submit(self._conditional_get, key, url, fallback, timeout, entry)
+            self.revalidations[key] = future
+        future.add_done_callback(lambda _: self._revalidation_done(key))
+
+    def _revalidation_done(self, key: Tuple) -> None:
+        with self._revalidation_lock:
+            self.revalidations.pop(key, None)
+
     # Initialize game with stream URL
     def initialize_game(self, stream_url: str) -> ServiceResult:
         try:
@@ -175,10 +260,14 @@ class ArenaGameService:
                 self.game_state = payload if isinstance(payload, dict) else None
                 # Connect to websocket if provided
                 if isinstance(self.game_state, dict) and self.game_state.get("websocketUrl"):
-                    self.connect_websocket(self.game_state["websocketUrl"])
-                return ServiceResult(True, self.game_state or data)
+                    if self.supervisor is not None:
+                        self.supervisor.ws_url = self.game_state["websocketUrl"]
+                        self.supervisor.start()
+                    else:
+                        self.connect_websocket(self.game_state["websocketUrl"])
+                return ServiceResult(True, self.game_state or data, status=resp.status_code)
             else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to initialize game"))
+                return ServiceResult(False, error=self._extract_error(resp, "Failed to initialize game"), status=resp.status_code)
         except requests.RequestException as exc:
             return ServiceResult(False, error=str(exc))
 
@@ -201,23 +290,33 @@ class ArenaGameService:
                 print("[arena] Socket connect failed:", e)
             return False
 
+    def supervise(self, ws_url: Optional[str] = None, **options: Any) -> ConnectionSupervisor:
+        """Connect and stay connected, reconnecting with backoff until disconnect().
+
+        options are passed to ConnectionSupervisor. Without ws_url the URL from
+        initialize_game is used, or socket_url before the game is initialized.
+        """
+        if self.supervisor is None:
+            if ws_url is None and isinstance(self.game_state, dict):
+                ws_url = self.game_state.get("websocketUrl")
+            self.supervisor = ConnectionSupervisor(self, ws_url, **options)
+        self.supervisor.start()
+        return self.supervisor
+
+    def emit(self, event: str, data: Any = None) -> bool:
+        # Buffered until the connection is back when supervised, returns True if sent now
+        if self.supervisor is not None:
+            return self.supervisor.emit(event, data)
+        try:
+            self.sio.emit(event, data)
+            return True
+        except socketio.exceptions.SocketIOError:
+            return False
+
     # HTTP API wrappers
     def get_game_details(self, game_id: str) -> ServiceResult:
-        try:
-            url = f"{self.base_api_url}/games/{game_id}"
-            if self.debug:
-                print(f"[arena] GET {url}")
-            resp = self.session.get(url, timeout=15)
-            if resp.ok:
-                try:
-                    data = resp.json()
-                except Exception:
-                    data = {"raw": resp.text}
-                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data)
-            else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to get game details"))
-        except requests.RequestException as exc:
-            return ServiceResult(False, error=str(exc))
+        url = f"{self.base_api_url}/games/{game_id}"
+        return self._cached_get(("game_details", game_id), url, "Failed to get game details", 15)
 
     def boost_player(self, game_id: str, player_id: str, amount: int, username: str) -> ServiceResult:
         try:
@@ -226,13 +325,14 @@ class ArenaGameService:
                 print(f"[arena] POST {url}")
             resp = self.session.post(url, json={"amount": amount, "username": username}, timeout=20)
             if resp.ok:
+                self.cache.invalidate(("game_details", game_id))
                 try:
                     data = resp.json()
                 except Exception:
                     data = {"raw": resp.text}
-                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data)
+                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status_code)
             else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to boost player"))
+                return ServiceResult(False, error=self._extract_error(resp, "Failed to boost player"), status=resp.status_code)
         except requests.RequestException as exc:
             return ServiceResult(False, error=str(exc))
 
@@ -243,32 +343,20 @@ class ArenaGameService:
                 print(f"[arena] PUT {url}")
             resp = self.session.put(url, json={"streamUrl": stream_url, "oldStreamUrl": old_stream_url}, timeout=20)
             if resp.ok:
+                self.cache.invalidate(("game_details", game_id))
                 try:
                     data = resp.json()
                 except Exception:
                     data = {"raw": resp.text}
-                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data)
+                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status_code)
             else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to update stream URL"))
+                return ServiceResult(False, error=self._extract_error(resp, "Failed to update stream URL"), status=resp.status_code)
         except requests.RequestException as exc:
             return ServiceResult(False, error=str(exc))
 
     def get_items_catalog(self) -> ServiceResult:
-        try:
-            url = f"{self.base_api_url}/items/catalog"
-            if self.debug:
-                print(f"[arena] GET {url}")
-            resp = self.session.get(url, timeout=15)
-            if resp.ok:
-                try:
-                    data = resp.json()
-                except Exception:
-                    data = {"raw": resp.text}
-                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data)
-            else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to get items catalog"))
-        except requests.RequestException as exc:
-            return ServiceResult(False, error=str(exc))
+        url = f"{self.base_api_url}/items/catalog"
+        return self._cached_get(("items_catalog",), url, "Failed to get items catalog", 15)
 
     def drop_immediate_item(self, game_id: str, item_id: str, target_player: str) -> ServiceResult:
         try:
@@ -277,19 +365,44 @@ class ArenaGameService:
                 print(f"[arena] POST {url}")
             resp = self.session.post(url, json={"itemId": item_id, "targetPlayer": target_player}, timeout=20)
             if resp.ok:
+                self.cache.invalidate(("game_details", game_id))
                 try:
                     data = resp.json()
                 except Exception:
                     data = {"raw": resp.text}
-                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data)
+                return ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status_code)
             else:
-                return ServiceResult(False, error=self._extract_error(resp, "Failed to drop item"))
+                return ServiceResult(False, error=self._extract_error(resp, "Failed to drop item"), status=resp.status_code)
         except requests.RequestException as exc:
             return ServiceResult(False, error=str(exc))
 
+    # Queued variants: return at once with a Future for the ServiceResult
+    def _commands(self) -> CommandQueue:
+        if self.command_queue is None:
+            self.command_queue = CommandQueue(self)
+        self.command_queue.start()
+        return self.command_queue
+
+    def queue_boost_player(self, game_id: str, player_id: str, amount: int, username: str) -> Future:
+        return self._commands().boost_player(game_id, player_id, amount, username)
+
+    def queue_drop_immediate_item(self, game_id: str, item_id: str, target_player: str) -> Future:
+        return self._commands().drop_immediate_item(game_id, item_id, target_player)
+
     # Control
     def disconnect(self) -> None:
         try:
+            if self.command_queue is not None:
+                # Send what viewers already paid for before going away
+                self.command_queue.stop(timeout=10)
+            if self.supervisor is not None:
+                # Stop it first so this disconnect is not undone
+                self.supervisor.stop()
+            with self._revalidation_lock:
+                if self._revalidator is not None:
+                    # Queued refreshes are dropped, one already in flight ends with its request
+                    self._revalidator.shutdown(wait=False, cancel_futures=True)
+                    self._revalidator = None
             if self.sio.connected:
                 self.sio.disconnect()
         finally:
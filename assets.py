@@ -0,0 +1,105 @@
+import pygame as pg
+import constants as c
+
+#images are packed side by side on shelves of atlas pages this size
+ATLAS_SIZE = 1024
+
+ENEMY_IMAGES = {
+  "weak": "assets/images/enemies/enemy_1.png",
+  "medium": "assets/images/enemies/enemy_2.png",
+  "strong": "assets/images/enemies/enemy_3.png",
+  "elite": "assets/images/enemies/enemy_4.png",
+}
+
+def turret_sheet_path(level):
+  return f"assets/images/turrets/turret_{level}.png"
+
+def slice_sheet(sheet, count):
+  #split a horizontal strip of square frames
+  size = sheet.get_height()
+  return [sheet.subsurface(x * size, 0, size, size) for x in range(count)]
+
+class AtlasPage():
+  """One large surface that images are copied onto, shelf by shelf."""
+  def __init__(self, size):
+    self.surface = pg.Surface((size, size), pg.SRCALPHA)
+    if pg.display.get_surface() is not None:
+      self.surface = self.surface.convert_alpha()
+    self.size = size
+    #top of the current shelf, its height and how far along it is filled
+    self.shelf_y = 0
+    self.shelf_height = 0
+    self.x = 0
+
+  def add(self, image):
+    #returns a subsurface holding a copy of image, or None when the page is full
+    width, height = image.get_size()
+    if self.x + width > self.size:
+      self.shelf_y += self.shelf_height
+      self.shelf_height = 0
+      self.x = 0
+    if self.x + width > self.size or self.shelf_y + height > self.size:
+      return None
+    rect = pg.Rect(self.x, self.shelf_y, width, height)
+    #copy the pixels as they are rather than blending onto the empty page
+    self.surface.blit(image, rect, special_flags = pg.BLEND_RGBA_MAX)
+    self.x += width
+    self.shelf_height = max(self.shelf_height, height)
+    return self.surface.subsurface(rect)
+
+class AssetManager():
+  """Loads every image once and packs sprites into shared atlas pages.
+
+  image() and frames() return subsurfaces of a few large atlas surfaces, so
+  everything blitted each frame lives close together in memory. Sprite sheets
+  are sliced a single time and the frame lists are shared by every object
+  that uses them, which keeps turret construction and upgrades free of
+  surface allocations.
+  """
+  def __init__(self, atlas_size = ATLAS_SIZE):
+    self.atlas_size = atlas_size
+    self.pages = []
+    self.images = {}
+    self.sheets = {}
+
+  def load(self, path):
+    image = pg.image.load(path)
+    if pg.display.get_surface() is not None:
+      image = image.convert_alpha()
+    return image
+
+  def pack(self, image):
+    for page in self.pages:
+      packed = page.add(image)
+      if packed is not None:
+        return packed
+    #images too big for a page keep their own surface
+    if image.get_width() > self.atlas_size or image.get_height() > self.atlas_size:
+      return image
+    page = AtlasPage(self.atlas_size)
+    self.pages.append(page)
+    return page.add(image)
+
+  def image(self, path, atlas = True):
+    #large one-off images such as the map are better left out of the atlas
+    image = self.images.get(path)
+    if image is None:
+      image = self.load(path)
+      if atlas:
+        image = self.pack(image)
+      self.images[path] = image
+    return image
+
+  def frames(self, path, count):
+    frames = self.sheets.get(path)
+    if frames is None:
+      frames = slice_sheet(self.image(path), count)
+      self.sheets[path] = frames
+    return frames
+
+  def turret_frames(self):
+    #animation frames for every upgrade level
+    return [self.frames(turret_sheet_path(level), c.ANIMATION_STEPS) for level in range(1, c.TURRET_LEVELS + 1)]
+
+  def enemy_images(self):
+    return {enemy_type: self.image(path) for enemy_type, path in ENEMY_IMAGES.items()}
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import socketio  # python-socketio client
+
+from arena_game_service import ARENA_GAME_ID, ARENA_SERVER_URL, GAME_API_URL, VORLD_APP_ID, ServiceResult
+from event_bus import ArenaEvent, EventBus
+from response_cache import ResponseCache
+
+# Socket.io events forwarded to the matching on_<event> callback, or the event queue without one
+ARENA_EVENTS = (
+    "arena_countdown_started",
+    "countdown_update",
+    "arena_begins",
+    "player_boost_activated",
+    "boost_cycle_update",
+    "boost_cycle_complete",
+    "package_drop",
+    "immediate_item_drop",
+    "event_triggered",
+    "player_joined",
+    "game_completed",
+    "game_stopped",
+)
+
+
+class AsyncArenaGameService:
+    """Non-blocking ArenaGameService built on asyncio.
+
+    The API methods are coroutines sharing one pooled aiohttp session, so many
+    calls can be in flight at once. A game loop that must never wait on the
+    network calls start() once, fires requests with submit(), and picks up
+    finished ServiceResults and socket events each frame with poll_results()
+    and poll_events(). Both are fed through thread-safe queues from a private
+    event loop thread. An event goes to its on_<event> callback when one is
+    set and to poll_events() only when not, so a queue nobody drains cannot
+    grow.
+    """
+
+    def __init__(self, user_token: str = "", *, base_api_url: Optional[str] = None, socket_url: Optional[str] = None, debug: bool = False, max_connections: int = 10, cache: Optional[ResponseCache] = None, event_bus: Optional[EventBus] = None):
+        self.user_token = user_token
+        self.base_api_url = (base_api_url or GAME_API_URL).rstrip("/")
+        self.socket_url = (socket_url or ARENA_SERVER_URL)
+        self.debug = debug
+        self.max_connections = max_connections
+        self.game_state: Optional[Dict[str, Any]] = None
+
+        # Catalog and game details responses, revalidated in the background once stale
+        self.cache = cache if cache is not None else ResponseCache()
+        self.revalidations: Dict[Tuple, "asyncio.Task[ServiceResult]"] = {}
+
+        self.headers = {
+            "X-Arena-Arcade-Game-ID": ARENA_GAME_ID,
+            "X-Vorld-App-ID": VORLD_APP_ID,
+            "Content-Type": "application/json",
+        }
+        if self.user_token:
+            self.headers["Authorization"] = f"Bearer {self.user_token}"
+        # Created on first use, aiohttp sessions must belong to a running loop
+        self.http: Optional[aiohttp.ClientSession] = None
+
+        # Finished submit() calls as (tag, ServiceResult) and socket events as (event, data)
+        self.results: "queue.Queue[Tuple[Any, ServiceResult]]" = queue.Queue()
+        self.events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+
+        # With an event bus, socket events go there instead of the events queue and
+        # the callbacks run from dispatch_events() rather than on the event loop
+        self.event_bus = event_bus
+
+        # Socket.io client
+        self.sio = socketio.AsyncClient(logger=self.debug, engineio_logger=self.debug)
+
+        # Event callbacks, called on the event loop thread (assign from outside as needed)
+        self.on_arena_countdown_started: Optional[Callable[[Any], None]] = None
+        self.on_countdown_update: Optional[Callable[[Any], None]] = None
+        self.on_arena_begins: Optional[Callable[[Any], None]] = None
+        self.on_player_boost_activated: Optional[Callable[[Any], None]] = None
+        self.on_boost_cycle_update: Optional[Callable[[Any], None]] = None
+        self.on_boost_cycle_complete: Optional[Callable[[Any], None]] = None
+        self.on_package_drop: Optional[Callable[[Any], None]] = None
+        self.on_immediate_item_drop: Optional[Callable[[Any], None]] = None
+        self.on_event_triggered: Optional[Callable[[Any], None]] = None
+        self.on_player_joined: Optional[Callable[[Any], None]] = None
+        self.on_game_completed: Optional[Callable[[Any], None]] = None
+        self.on_game_stopped: Optional[Callable[[Any], None]] = None
+
+        # Wire socket event handlers
+        self._wire_socket_handlers()
+
+    def _wire_socket_handlers(self) -> None:
+        @self.sio.event
+        async def connect():
+            if self.debug:
+                print("[arena] Connected to socket")
+
+        @self.sio.event
+        async def connect_error(err):
+            if self.debug:
+                print("[arena] Connect error:", err)
+
+        @self.sio.event
+        async def disconnect():
+            if self.debug:
+                print("[arena] Disconnected")
+
+        for event in ARENA_EVENTS:
+            self.sio.on(event, self._make_event_handler(event))
+
+    def _make_event_handler(self, event: str) -> Callable[[Any], Any]:
+        async def handler(data=None):
+            if self.event_bus is not None:
+                self.event_bus.publish(event, data)
+                return
+            callback = getattr(self, f"on_{event}")
+            if callback:
+                callback(data)
+            else:
+                self.events.put((event, data))
+        return handler
+
+    # Helpers
+    def _session(self) -> aiohttp.ClientSession:
+        if self.http is None or self.http.closed:
+            # One keep-alive pool for every call, capped at max_connections sockets
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self.http = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self.http
+
+    @staticmethod
+    def _extract_error(status: int, text: str, body: Any, fallback: str) -> str:
+        if isinstance(body, dict):
+            msg = body.get("message") or body.get("error") or body.get("detail")
+            if msg:
+                return f"{msg} (status {status})"
+        text = (text or "").strip()
+        if text:
+            snippet = text if len(text) < 500 else text[:500] + "..."
+            return f"{fallback} (status {status}): {snippet}"
+        return f"{fallback} (status {status})"
+
+    async def _request(self, method: str, path: str, fallback: str, *, json: Optional[Dict[str, Any]] = None, timeout: float = 20) -> Tuple[ServiceResult, Any]:
+        # Returns the result and the full decoded body
+        url = f"{self.base_api_url}{path}"
+        if self.debug:
+            print(f"[arena] {method} {url}")
+        try:
+            async with self._session().request(method, url, json=json, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                text = await resp.text()
+                try:
+                    data = await resp.json(content_type=None)
+                except ValueError:
+                    data = None
+                if resp.status < 400:
+                    if data is None:
+                        data = {"raw": text}
+                    return ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status), data
+                return ServiceResult(False, error=self._extract_error(resp.status, text, data, fallback), status=resp.status), data
+        except asyncio.TimeoutError:
+            return ServiceResult(False, error=f"{fallback}: timed out after {timeout}s"), None
+        except aiohttp.ClientError as exc:
+            return ServiceResult(False, error=str(exc)), None
+
+    async def _cached_get(self, key: Tuple, path: str, fallback: str, timeout: float) -> ServiceResult:
+        entry, state = self.cache.lookup(key)
+        if state == "fresh":
+            return entry.result
+        if state == "stale":
+            # Serve what we have now and refresh it in a task of its own
+            if key not in self.revalidations:
+                task = asyncio.ensure_future(self._conditional_get(key, path, fallback, timeout, entry))
+                self.revalidations[key] = task
+                task.add_done_callback(lambda _: self.revalidations.pop(key, None))
+            return entry.result
+        return await self._conditional_get(key, path, fallback, timeout, entry)
+
+    async def _conditional_get(self, key: Tuple, path: str, fallback: str, timeout: float, entry: Any = None) -> ServiceResult:
+        url = f"{self.base_api_url}{path}"
+        if self.debug:
+            print(f"[arena] GET {url}")
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+        # A write that invalidates the key while this is in flight makes the response unusable
+        generation = self.cache.generation(key)
+        try:
+            async with self._session().get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status == 304 and entry is not None:
+                    self.cache.touch(key, generation)
+                    return entry.result
+                text = await resp.text()
+                try:
+                    data = await resp.json(content_type=None)
+                except ValueError:
+                    data = None
+                if resp.status >= 400:
+                    return ServiceResult(False, error=self._extract_error(resp.status, text, data, fallback), status=resp.status)
+                if data is None:
+                    data = {"raw": text}
+                result = ServiceResult(True, data.get("data") if isinstance(data, dict) else data, status=resp.status)
+                self.cache.store(key, result, resp.headers.get("ETag"), generation)
+                return result
+        except asyncio.TimeoutError:
+            return ServiceResult(False, error=f"{fallback}: timed out after {timeout}s")
+        except aiohttp.ClientError as exc:
+            return ServiceResult(False, error=str(exc))
+
+    # Initialize game with stream URL
+    async def initialize_game(self, stream_url: str) -> ServiceResult:
+        result, data = await self._request("POST", "/games/init", "Failed to initialize game", json={"streamUrl": stream_url})
+        if not result.success:
+            return result
+        self.game_state = result.data if isinstance(result.data, dict) else None
+        # Connect to websocket if provided
+        if isinstance(self.game_state, dict) and self.game_state.get("websocketUrl"):
+            await self.connect_websocket(self.game_state["websocketUrl"])
+        return ServiceResult(True, self.game_state or data)
+
+    # Connect to WebSocket
+    async def connect_websocket(self, ws_url: Optional[str] = None) -> bool:
+        url = ws_url or self.socket_url
+        if not url:
+            if self.debug:
+                print("[arena] Missing websocket URL")
+            return False
+        try:
+            await self.sio.connect(
+                url,
+                transports=["websocket"],
+                auth={"token": self.user_token, "appId": VORLD_APP_ID},
+            )
+            return True
+        except Exception as e:
+            if self.debug:
+                print("[arena] Socket connect failed:", e)
+            return False
+
+    # HTTP API wrappers
+    async def get_game_details(self, game_id: str) -> ServiceResult:
+        return await self._cached_get(("game_details", game_id), f"/games/{game_id}", "Failed to get game details", 15)
+
+    async def boost_player(self, game_id: str, player_id: str, amount: int, username: str) -> ServiceResult:
+        result, _ = await self._request("POST", f"/games/boost/player/{game_id}/{player_id}", "Failed to boost player", json={"amount": amount, "username": username})
+        if result.success:
+            self.cache.invalidate(("game_details", game_id))
+        return result
+
+    async def update_stream_url(self, game_id: str, stream_url: str, old_stream_url: str) -> ServiceResult:
+        result, _ = await self._request("PUT", f"/games/{game_id}/stream-url", "Failed to update stream URL", json={"streamUrl": stream_url, "oldStreamUrl": old_stream_url})
+        if result.success:
+            self.cache.invalidate(("game_details", game_id))
+        return result
+
+    async def get_items_catalog(self) -> ServiceResult:
+        return await self._cached_get(("items_catalog",), "/items/catalog", "Failed to get items catalog", 15)
+
+    async def drop_immediate_item(self, game_id: str, item_id: str, target_player: str) -> ServiceResult:
+        result, _ = await self._request("POST", f"/items/drop/{game_id}", "Failed to drop item", json={"itemId": item_id, "targetPlayer": target_player})
+        if result.success:
+            self.cache.invalidate(("game_details", game_id))
+        return result
+
+    # Control
+    async def close(self) -> None:
+        for task in list(self.revalidations.values()):
+            task.cancel()
+        try:
+            if self.sio.connected:
+                await self.sio.disconnect()
+            if self.http is not None:
+                await self.http.close()
+        finally:
+            self.http = None
+            self.game_state = None
+
+    def get_game_state(self) -> Optional[Dict[str, Any]]:
+        return self.game_state
+
+    # Background loop for callers that are not async themselves, such as the pygame loop
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, args=(self.loop,), name="arena-async", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        # The loop is closed here, once run_forever has returned, so stop() never closes a running loop
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, method: str, *args: Any, tag: Any = None, **kwargs: Any) -> Future:
+        """Run an API coroutine by name on the background loop without waiting.
+
+        The ServiceResult is put on the results queue as (tag, result), tag
+        defaulting to the method name, and is also available from the future.
+        """
+        if self.loop is None:
+            raise RuntimeError("call start() before submit()")
+        tag = method if tag is None else tag
+
+        async def run() -> ServiceResult:
+            try:
+                result = await getattr(self, method)(*args, **kwargs)
+            except Exception as exc:
+                result = ServiceResult(False, error=str(exc))
+            self.results.put((tag, result))
+            return result
+
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def poll_results(self, max_items: Optional[int] = None) -> List[Tuple[Any, ServiceResult]]:
+        # Never blocks, safe to call every frame
+        return self._drain(self.results, max_items)
+
+    def poll_events(self, max_items: Optional[int] = None) -> List[Tuple[str, Any]]:
+        return self._drain(self.events, max_items)
+
+    def _dispatch(self, event: ArenaEvent) -> None:
+        callback = getattr(self, f"on_{event.name}")
+        if callback:
+            callback(event.data)
+
+    def dispatch_events(self, budget: Optional[float] = 0.004, max_events: Optional[int] = None) -> int:
+        # Call once per frame from the game loop, returns the number of events delivered
+        if self.event_bus is None:
+            return 0
+        return self.event_bus.drain(self._dispatch, budget, max_events)
+
+    @staticmethod
+    def _drain(source: queue.Queue, max_items: Optional[int]) -> List[Any]:
+        items = []
+        while max_items is None or len(items) < max_items:
+            try:
+                items.append(source.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def stop(self, timeout: float = 5) -> None:
+        """Close the session and socket, then stop the background loop.
+
+        A loop still busy after timeout closes itself when it finishes; it
+        takes no new work, and a later start() runs on a fresh loop.
+        """
+        if self.loop is None:
+            return
+        loop, thread = self.loop, self.thread
+        self.loop = None
+        self.thread = None
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
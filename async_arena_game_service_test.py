@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from arena_cache_test import FakeArena
+from async_arena_game_service import AsyncArenaGameService
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_submitted_calls_are_in_flight_together():
+    server = FakeArena()
+    server.hold = threading.Event()
+    service = AsyncArenaGameService(base_api_url=server.url)
+    service.start()
+    try:
+        futures = [service.submit("get_game_details", game_id) for game_id in "abcd"]
+        # All four reach the server while every one of them is still held
+        wait_until(lambda: len(server.requests) == 4)
+        assert not any(future.done() for future in futures)
+        server.hold.set()
+        assert [future.result(5).data["gameId"] for future in futures] == ["a", "b", "c", "d"]
+    finally:
+        server.hold.set()
+        service.stop()
+        server.close()
+
+
+def test_poll_results_come_in_completion_order():
+    server = FakeArena()
+    server.hold = threading.Event()
+    service = AsyncArenaGameService(base_api_url=server.url)
+    service.start()
+    try:
+        slow = service.submit("get_game_details", "a", tag="slow")
+        assert server.held.wait(5)
+        service.submit("get_items_catalog").result(5)
+        assert [tag for tag, _ in service.poll_results()] == ["get_items_catalog"]
+        assert service.poll_results() == []
+        server.hold.set()
+        slow.result(5)
+        for tag in ("first", "second"):
+            service.submit("boost_player", "a", "p1", 1, "viewer", tag=tag).result(5)
+        assert [tag for tag, _ in service.poll_results(max_items=2)] == ["slow", "first"]
+        tag, result = service.poll_results()[0]
+        assert tag == "second" and result.success
+    finally:
+        server.hold.set()
+        service.stop()
+        server.close()
+
+
+def test_stop_and_start_again():
+    server = FakeArena()
+    service = AsyncArenaGameService(base_api_url=server.url)
+    try:
+        for _ in range(2):
+            service.start()
+            loop, thread = service.loop, service.thread
+            assert service.submit("boost_player", "a", "p1", 1, "viewer").result(5).success
+            service.stop()
+            assert service.loop is None and service.thread is None
+            assert not thread.is_alive() and loop.is_closed()
+        # Stopping again is harmless, submitting needs a fresh start()
+        service.stop()
+        try:
+            service.submit("get_items_catalog")
+        except RuntimeError:
+            pass
+        else:
+            assert False, "expected RuntimeError"
+        assert server.requests == ["/games/boost/player/a/p1"] * 2
+    finally:
+        server.close()
+
+
+def test_stop_while_the_loop_is_busy_lets_it_close_itself():
+    service = AsyncArenaGameService(base_api_url="http://127.0.0.1:9")
+    release = threading.Event()
+    # A callback that blocks the loop thread, as a slow game hook would
+    service.on_arena_begins = lambda data: release.wait(5)
+    service.start()
+    loop, thread = service.loop, service.thread
+    asyncio.run_coroutine_threadsafe(service._make_event_handler("arena_begins")(None), loop)
+    try:
+        service.stop(timeout=0.1)
+    except FutureTimeoutError:
+        pass
+    else:
+        assert False, "expected the close to time out"
+    assert thread.is_alive() and service.loop is None
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive() and loop.is_closed()
+    service.start()
+    assert service.thread is not thread
+    service.stop()
+
+
+def test_events_with_a_callback_are_not_queued():
+    service = AsyncArenaGameService(base_api_url="http://127.0.0.1:9")
+    seen = []
+    service.on_arena_begins = seen.append
+    asyncio.run(service._make_event_handler("arena_begins")({"round": 1}))
+    asyncio.run(service._make_event_handler("game_completed")({"winner": "p1"}))
+    assert seen == [{"round": 1}]
+    assert service.poll_events() == [("game_completed", {"winner": "p1"})]
+    assert service.poll_events() == []
@@ -0,0 +1,214 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import constants as c
+from enemy_data import ENEMY_SPAWN_DATA
+from entity import ENEMY_STATS, TURRET_STATS
+from level_compiler import load_level
+from simulation import Simulation
+
+#longest a wave may run before the game is abandoned
+MAX_WAVE_STEPS = 60000
+#constants the game reads while playing; the rest are layout or are captured at import
+TUNABLE_CONSTANTS = (
+  "HEALTH", "MONEY", "SPAWN_COOLDOWN", "BUY_COST", "UPGRADE_COST",
+  "KILL_REWARD", "LEVEL_COMPLETE_REWARD", "ANIMATION_DELAY", "DAMAGE",
+)
+
+#level shared by every game in a worker process, set by init_worker
+worker_level = None
+
+def parameter_setter(name):
+  """Return (get, set) for a tunable parameter name.
+
+  Names are either one of TUNABLE_CONSTANTS, or a dotted path
+  into the data tables: enemy.<type>.<health|speed>,
+  turret.<level>.<range|cooldown> and spawn.<wave>.<type>.
+  """
+  parts = name.split(".")
+  if len(parts) == 1:
+    if name not in TUNABLE_CONSTANTS:
+      raise ValueError(f"{name} is not a tunable constant, expected one of {', '.join(TUNABLE_CONSTANTS)}")
+    return (lambda: getattr(c, name)), (lambda value: setattr(c, name, value))
+  kind, key, field = parts if len(parts) == 3 else (None, None, None)
+  if kind == "enemy" and key in ENEMY_STATS and field in ("health", "speed"):
+    stats = ENEMY_STATS[key]
+  elif kind == "turret" and key.isdigit() and 1 <= int(key) <= len(TURRET_STATS) and field in ("range", "cooldown"):
+    stats = TURRET_STATS[int(key) - 1]
+  elif kind == "spawn" and key.isdigit() and 1 <= int(key) <= len(ENEMY_SPAWN_DATA) and field in ENEMY_SPAWN_DATA[0]:
+    wave = ENEMY_SPAWN_DATA[int(key) - 1]
+    return (lambda: wave[field]), (lambda value: wave.__setitem__(field, value))
+  else:
+    raise ValueError(f"unknown parameter {name}")
+  return (lambda: getattr(stats, field)), (lambda value: setattr(stats, field, value))
+
+def apply_parameters(params):
+  #returns the setters and old values needed to put everything back
+  undo = []
+  for name, value in params.items():
+    get, set_value = parameter_setter(name)
+    undo.append((set_value, get()))
+    set_value(value)
+  return undo
+
+def restore_parameters(undo):
+  for set_value, value in reversed(undo):
+    set_value(value)
+
+def build_layout(sim, layout):
+  """Buy and upgrade the layout's turrets in order for as long as money allows.
+
+  Each entry is [tile_x, tile_y] or [tile_x, tile_y, upgrade_level].
+  """
+  for entry in layout:
+    tile_x, tile_y = entry[0], entry[1]
+    level = entry[2] if len(entry) > 2 else 1
+    turret = sim.turret_at(tile_x, tile_y)
+    if turret is None:
+      turret = sim.command("place_turret", tile_x, tile_y)
+      if turret is None:
+        return
+    while turret.upgrade_level < level:
+      if not sim.command("upgrade_turret", tile_x, tile_y):
+        return
+
+def play_game(level, params, layout, seed):
+  """Play one headless game, building the layout before every wave."""
+  undo = apply_parameters(params)
+  try:
+    sim = Simulation(level, seed = seed)
+    money = []
+    clear_seconds = []
+    while not sim.game_over and sim.world.level <= c.TOTAL_LEVELS:
+      build_layout(sim, layout)
+      start = sim.steps
+      if not sim.run_level(max_steps = MAX_WAVE_STEPS):
+        break
+      money.append(sim.world.money)
+      clear_seconds.append((sim.steps - start) * c.SIM_STEP_MS / 1000)
+    return {
+      "outcome": "win" if len(money) == c.TOTAL_LEVELS else "loss",
+      "waves_survived": len(money),
+      "health_lost": c.HEALTH - max(sim.world.health, 0),
+      "final_money": sim.world.money,
+      "money": money,
+      "clear_seconds": clear_seconds,
+    }
+  finally:
+    restore_parameters(undo)
+
+def init_worker(level_path):
+  global worker_level
+  worker_level = load_level(level_path)
+
+def run_task(task):
+  params, layout_name, layout, seed = task
+  return play_game(worker_level, params, layout, seed)
+
+def parameter_grid(grid):
+  #every combination of the listed values, as dicts
+  names = list(grid)
+  for values in itertools.product(*(grid[name] for name in names)):
+    yield dict(zip(names, values))
+
+def default_layouts(level):
+  tiles = [(tile_num % level.width, tile_num // level.width) for tile_num in level.buildable_tiles]
+  return {
+    "every_third": [list(tile) for tile in tiles[::3]],
+    "every_sixth": [list(tile) for tile in tiles[::6]],
+  }
+
+def to_columns(tasks, results, param_names):
+  """Flatten results into named columns, one value per game."""
+  waves = c.TOTAL_LEVELS
+  columns = {name: [] for name in param_names}
+  for name in ("layout", "seed", "outcome", "waves_survived", "health_lost", "final_money"):
+    columns[name] = []
+  for wave in range(1, waves + 1):
+    columns[f"money_w{wave}"] = []
+    columns[f"clear_s_w{wave}"] = []
+  for (params, layout_name, layout, seed), result in zip(tasks, results):
+    for name in param_names:
+      columns[name].append(params[name])
+    columns["layout"].append(layout_name)
+    columns["seed"].append(seed)
+    for name in ("outcome", "waves_survived", "health_lost", "final_money"):
+      columns[name].append(result[name])
+    for wave in range(waves):
+      #waves that were never cleared are left empty
+      cleared = wave < len(result["money"])
+      columns[f"money_w{wave + 1}"].append(result["money"][wave] if cleared else None)
+      columns[f"clear_s_w{wave + 1}"].append(result["clear_seconds"][wave] if cleared else None)
+  return columns
+
+def write_columns(columns, path):
+  #.json is written column-wise, .parquet needs pyarrow, anything else is CSV
+  if path.endswith(".json"):
+    with open(path, "w") as file:
+      json.dump(columns, file)
+  elif path.endswith(".parquet"):
+    import pyarrow
+    import pyarrow.parquet
+    pyarrow.parquet.write_table(pyarrow.table(columns), path)
+  else:
+    names = list(columns)
+    with open(path, "w", newline = "") as file:
+      writer = csv.writer(file)
+      writer.writerow(names)
+      writer.writerows(zip(*(columns[name] for name in names)))
+
+def load_json_arg(value):
+  #inline JSON when it looks like an object, otherwise the path of a JSON file
+  if value.lstrip().startswith("{"):
+    return json.loads(value)
+  with open(value) as file:
+    return json.load(file)
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Play batches of headless games across a parameter grid")
+  parser.add_argument("--grid", help = "JSON object mapping parameter names to lists of values, inline or as a file path")
+  parser.add_argument("--layouts", help = "JSON object mapping layout names to turret lists, [tile_x, tile_y(, upgrade_level)], inline or as a file path")
+  parser.add_argument("--level", default = "levels/level.tmj", help = "Level to play")
+  parser.add_argument("--games", type = int, default = 10, help = "Seeds played per parameter set and layout")
+  parser.add_argument("--seed", type = int, default = 0, help = "First seed")
+  parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "Worker processes, 1 plays in this process")
+  parser.add_argument("--output", default = "balance.csv", help = "Results file: .csv, .json (columnar) or .parquet")
+  args = parser.parse_args(argv)
+
+  grid = load_json_arg(args.grid) if args.grid else {}
+  #catch typos before fanning out
+  for name in grid:
+    parameter_setter(name)
+  level = load_level(args.level)
+  if args.layouts:
+    layouts = load_json_arg(args.layouts)
+  else:
+    layouts = default_layouts(level)
+
+  tasks = [
+    (params, layout_name, layout, args.seed + game)
+    for params in parameter_grid(grid)
+    for layout_name, layout in layouts.items()
+    for game in range(args.games)
+  ]
+  start = time.perf_counter()
+  if args.workers <= 1:
+    init_worker(args.level)
+    results = [run_task(task) for task in tasks]
+  else:
+    #large chunks keep the per-game pickling overhead small
+    chunksize = max(1, len(tasks) // (args.workers * 8))
+    with ProcessPoolExecutor(args.workers, initializer = init_worker, initargs = (args.level,)) as executor:
+      results = list(executor.map(run_task, tasks, chunksize = chunksize))
+  elapsed = time.perf_counter() - start
+
+  write_columns(to_columns(tasks, results, list(grid)), args.output)
+  print(f"{len(tasks)} games in {elapsed:.1f}s ({len(tasks) / elapsed:.1f} games/s) -> {args.output}")
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit(main())
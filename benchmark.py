@@ -0,0 +1,250 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+#render benchmarks run without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+import constants as c
+from assets import AssetManager
+from enemy_data import ENEMY_SPAWN_DATA
+from simulation import Simulation
+from level_compiler import load_level
+from enemy import Enemy
+from turret import Turret
+
+SEED = 1234
+STRESS_ENEMIES = 5000
+STRESS_STEPS = 300
+#entities allocated to measure the footprint of one
+FOOTPRINT_ENTITIES = 10000
+#longest a wave may run before the benchmark gives up on it clearing
+MAX_WAVE_STEPS = 60000
+
+def place_turrets(sim, tiles):
+  #benchmarks measure the engine, not the economy
+  sim.world.money = len(tiles) * c.BUY_COST
+  for tile_x, tile_y in tiles:
+    sim.create_turret(tile_x, tile_y)
+
+def wave_scenario(world_data, level, **sim_args):
+  def build():
+    sim = Simulation(world_data, seed = SEED, **sim_args)
+    sim.world.level = level
+    sim.world.reset_level()
+    sim.world.process_enemies()
+    #every third grass tile gives the turrets work without clearing waves instantly
+    place_turrets(sim, sim.world.free_buildable_tiles()[::3])
+    sim.world.health = 10 ** 9
+    sim.begin_level()
+    return sim
+  return build
+
+def saturated_scenario(world_data, **sim_args):
+  def build():
+    sim = wave_scenario(world_data, c.TOTAL_LEVELS, **sim_args)()
+    #fill every grass tile the wave scenario left free
+    place_turrets(sim, sim.world.free_buildable_tiles())
+    return sim
+  return build
+
+def stress_scenario(world_data, **sim_args):
+  def build():
+    sim = Simulation(world_data, seed = SEED, **sim_args)
+    place_turrets(sim, sim.world.free_buildable_tiles()[::3])
+    sim.world.health = 10 ** 9
+    #spread the whole wave along the path so every enemy is live from the first step
+    enemy_types = list(ENEMY_SPAWN_DATA[-1])
+    path = sim.world.path
+    for index in range(STRESS_ENEMIES):
+      enemy = sim.spawn_enemy(enemy_types[index % len(enemy_types)])
+      place_along_path(sim, enemy, path.length * index / STRESS_ENEMIES)
+    return sim
+  return build
+
+def place_along_path(sim, enemy, distance):
+  path = sim.world.path
+  if sim.enemy_store:
+    sim.enemy_store.distance[enemy.index] = distance
+    sim.enemy_store.pos[enemy.index] = path.position_at(distance)
+    sim.enemy_store.prev_pos[enemy.index] = sim.enemy_store.pos[enemy.index]
+  else:
+    enemy.distance = distance
+    enemy.segment = path.segment_at(distance)
+    enemy.pos.update(path.position_at(distance, enemy.segment))
+    enemy.prev_pos.update(enemy.pos)
+
+def wave_running(sim, level):
+  return not sim.game_over and sim.world.level == level
+
+def measure_update(build, max_steps):
+  sim = build()
+  level = sim.world.level
+  steps = 0
+  start = time.perf_counter()
+  while steps < max_steps and wave_running(sim, level):
+    sim.step()
+    steps += 1
+  elapsed = time.perf_counter() - start
+  return {
+    "steps": steps,
+    "seconds": elapsed,
+    "ticks_per_sec": steps / elapsed if elapsed else None,
+    "wave_cleared": sim.world.level > level,
+  }
+
+def measure_memory(build, max_steps):
+  tracemalloc.start()
+  sim = build()
+  level = sim.world.level
+  steps = 0
+  while steps < max_steps and wave_running(sim, level):
+    sim.step()
+    steps += 1
+  current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return {"peak_kib": peak / 1024, "current_kib": current / 1024}
+
+def footprint(make, count):
+  #bytes traced per entity while count of them are alive
+  gc.collect()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  entities = [make(index) for index in range(count)]
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return (after - before) / len(entities)
+
+def measure_entity_memory(world_data, count = FOOTPRINT_ENTITIES):
+  #headless entities, so only the simulation state is counted
+  path = Simulation(world_data, seed = SEED).world.path
+  enemy_types = list(ENEMY_SPAWN_DATA[-1])
+  frames = [[None] * c.ANIMATION_STEPS] * c.TURRET_LEVELS
+  result = {
+    "enemy_bytes": footprint(lambda index: Enemy(enemy_types[index % len(enemy_types)], path, None), count),
+    "turret_bytes": footprint(lambda index: Turret(frames, index % c.COLS, index // c.COLS, None), count),
+  }
+  try:
+    from enemy_store import EnemyStore
+  except ImportError:
+    return result
+  store = EnemyStore(path, capacity = count)
+  result["store_enemy_bytes"] = footprint(lambda index: store.spawn(enemy_types[index % len(enemy_types)]), count)
+  return result
+
+def measure_render(build, frames, dirty):
+  from renderer import Renderer
+  screen = pg.display.get_surface()
+  sim = build()
+  background = pg.Surface(screen.get_size()).convert()
+  sim.world.draw(background)
+  renderer = Renderer(screen, background, dirty)
+  level = sim.world.level
+  times = []
+  for frame in range(frames):
+    if not wave_running(sim, level):
+      break
+    sim.step()
+    start = time.perf_counter()
+    renderer.begin_frame()
+    sim.interpolate()
+    renderer.draw_group(sim.enemy_group)
+    for turret in sim.turret_group:
+      turret.draw(renderer)
+    renderer.end_frame()
+    times.append(time.perf_counter() - start)
+  times.sort()
+  if not times:
+    return {"frames": 0}
+  return {
+    "frames": len(times),
+    "mean_ms": sum(times) / len(times) * 1000,
+    "p95_ms": times[int(len(times) * 0.95)] * 1000,
+    "max_ms": times[-1] * 1000,
+  }
+
+def load_assets():
+  pg.init()
+  pg.display.set_mode((c.SCREEN_WIDTH + c.SIDE_PANEL, c.SCREEN_HEIGHT))
+  assets = AssetManager()
+  return {
+    "map": assets.image("levels/level.png", atlas = False),
+    "turrets": assets.turret_frames(),
+    "enemies": assets.enemy_images(),
+  }
+
+def scenarios(world_data, names, **sim_args):
+  result = {}
+  if "waves" in names:
+    for level in range(1, len(ENEMY_SPAWN_DATA) + 1):
+      result[f"wave_{level}"] = (wave_scenario(world_data, level, **sim_args), MAX_WAVE_STEPS)
+  if "saturated" in names:
+    result["saturated"] = (saturated_scenario(world_data, **sim_args), MAX_WAVE_STEPS)
+  if "stress" in names:
+    result["stress_5000"] = (stress_scenario(world_data, **sim_args), STRESS_STEPS)
+  return result
+
+def git_commit():
+  try:
+    return subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Benchmark simulation and rendering hot paths")
+  parser.add_argument("--scenarios", default = "waves,saturated,stress", help = "Comma separated: waves, saturated, stress")
+  parser.add_argument("--output", default = "bench_output.json", help = "Where to write the JSON results")
+  parser.add_argument("--enemy-store", action = "store_true", help = "Move enemies with the NumPy EnemyStore")
+  parser.add_argument("--render-frames", type = int, default = 120, help = "Frames to time per scenario, 0 to skip rendering")
+  parser.add_argument("--no-memory", action = "store_true", help = "Skip the tracemalloc pass")
+  args = parser.parse_args(argv)
+
+  world_data = load_level("levels/level.tmj")
+
+  names = args.scenarios.split(",")
+  results = {}
+  for name, (build, max_steps) in scenarios(world_data, names, use_enemy_store = args.enemy_store).items():
+    results[name] = {"update": measure_update(build, max_steps)}
+    if not args.no_memory:
+      results[name]["memory"] = measure_memory(build, max_steps)
+    print(name, json.dumps(results[name]["update"]))
+  entities = None
+  if not args.no_memory:
+    entities = measure_entity_memory(world_data)
+    print("entities", json.dumps(entities))
+
+  if args.render_frames:
+    assets = load_assets()
+    sim_args = {
+      "use_enemy_store": args.enemy_store,
+      "map_image": assets["map"],
+      "enemy_images": assets["enemies"],
+      "turret_frames": assets["turrets"],
+    }
+    for name, (build, max_steps) in scenarios(world_data, names, **sim_args).items():
+      results[name]["render"] = measure_render(build, args.render_frames, dirty = False)
+      results[name]["render_dirty"] = measure_render(build, args.render_frames, dirty = True)
+      print(name, json.dumps(results[name]["render"]))
+    pg.quit()
+
+  report = {
+    "commit": git_commit(),
+    "python": platform.python_version(),
+    "pygame": pg.version.ver,
+    "enemy_store": args.enemy_store,
+    "entities": entities,
+    "scenarios": results,
+  }
+  with open(args.output, "w") as file:
+    json.dump(report, file, indent = 2)
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Statuses worth trying again: rate limited or a server side failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def take(self) -> float:
+        # Takes a token and returns 0, or returns the seconds until one is available
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class Command:
+    kind: str
+    args: Dict[str, Any]
+    futures: List[Future] = field(default_factory=list)
+    attempts: int = 0
+
+
+@dataclass
+class QueueStats:
+    queued: int = 0
+    # Boosts folded into a request that was already waiting
+    coalesced: int = 0
+    sent: int = 0
+    retries: int = 0
+    failed: int = 0
+
+
+class CommandQueue:
+    """Sends boost_player and drop_immediate_item calls from a background thread.
+
+    Boosts for the same (game_id, player_id) queued within coalesce_window
+    seconds of the first one go out as one request with the amounts summed,
+    and every caller's future gets that request's ServiceResult. Requests are
+    spaced by a token bucket, and 429 or 5xx responses are retried after an
+    exponential backoff with full jitter, up to max_retries times.
+    """
+
+    def __init__(self, service: Any, *, rate: float = 5.0, burst: int = 10, coalesce_window: float = 0.25, max_retries: int = 4, base_backoff: float = 0.5, max_backoff: float = 8.0, clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.service = service
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.stats = QueueStats()
+
+        # (ready at, sequence, command), the sequence keeps equal times in FIFO order
+        self.heap: List[Tuple[float, int, Command]] = []
+        self.sequence = itertools.count()
+        # Boosts still open to coalescing, by (game_id, player_id)
+        self.pending_boosts: Dict[Tuple[str, str], Command] = {}
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = False
+
+    def start(self) -> None:
+        with self.condition:
+            # A worker still finishing after a timed out stop() just carries on
+            self.stopping = False
+            if self.thread is not None:
+                self.condition.notify()
+                return
+            self.thread = threading.Thread(target=self._run, name="arena-commands", daemon=True)
+            self.thread.start()
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None) -> None:
+        """Stop the worker, first sending everything queued unless drain is False.
+
+        The worker clears self.thread itself once it exits, so after a timeout
+        it keeps running and a later start() does not add a second one.
+        """
+        with self.condition:
+            self.stopping = True
+            if not drain:
+                for _, _, command in self.heap:
+                    for future in command.futures:
+                        future.cancel()
+                self.heap.clear()
+                self.pending_boosts.clear()
+            else:
+                # A drain sends what is left without waiting out coalesce windows,
+                # but retries still wait out their backoff
+                now = self.clock()
+                self.heap = [(ready_at if command.attempts else min(ready_at, now), sequence, command) for ready_at, sequence, command in self.heap]
+                heapq.heapify(self.heap)
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def boost_player(self, game_id: str, player_id: str, amount: int, username: str) -> Future:
+        future: Future = Future()
+        with self.condition:
+            self.stats.queued += 1
+            command = self.pending_boosts.get((game_id, player_id))
+            if command is not None:
+                command.args["amount"] += amount
+                command.args["username"] = username
+                command.futures.append(future)
+                self.stats.coalesced += 1
+                return future
+            command = Command("boost_player", {"game_id": game_id, "player_id": player_id, "amount": amount, "username": username}, [future])
+            self.pending_boosts[(game_id, player_id)] = command
+            self._push(self.clock() + (0.0 if self.stopping else self.coalesce_window), command)
+        return future
+
+    def drop_immediate_item(self, game_id: str, item_id: str, target_player: str) -> Future:
+        # Every drop is its own item, so drops are never coalesced
+        future: Future = Future()
+        with self.condition:
+            self.stats.queued += 1
+            self._push(self.clock(), Command("drop_immediate_item", {"game_id": game_id, "item_id": item_id, "target_player": target_player}, [future]))
+        return future
+
+    def depth(self) -> int:
+        with self.condition:
+            return len(self.heap)
+
+    def _push(self, ready_at: float, command: Command) -> None:
+        heapq.heappush(self.heap, (ready_at, next(self.sequence), command))
+        self.condition.notify()
+
+    def _next_command(self) -> Optional[Command]:
+        # Blocks until a command is due and a token is free, None once stopped
+        with self.condition:
+            while True:
+                if not self.heap:
+                    if self.stopping:
+                        self.thread = None
+                        return None
+                    self.condition.wait()
+                    continue
+                wait = self.heap[0][0] - self.clock()
+                if wait <= 0:
+                    wait = self.bucket.take()
+                    if wait <= 0:
+                        command = heapq.heappop(self.heap)[2]
+                        if command.kind == "boost_player":
+                            key = (command.args["game_id"], command.args["player_id"])
+                            if self.pending_boosts.get(key) is command:
+                                del self.pending_boosts[key]
+                        return command
+                self.condition.wait(wait)
+
+    def _run(self) -> None:
+        while True:
+            command = self._next_command()
+            if command is None:
+                return
+            try:
+                result = getattr(self.service, command.kind)(**command.args)
+            except Exception as exc:
+                with self.condition:
+                    self.stats.failed += 1
+                for future in command.futures:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(exc)
+                continue
+            command.attempts += 1
+            with self.condition:
+                self.stats.sent += 1
+                if not result.success and result.status in RETRY_STATUSES and command.attempts <= self.max_retries:
+                    self.stats.retries += 1
+                    self._push(self.clock() + self._backoff(command.attempts), command)
+                    continue
+                if not result.success:
+                    self.stats.failed += 1
+            for future in command.futures:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(result)
+
+    def _backoff(self, attempts: int) -> float:
+        return self.rng.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)))
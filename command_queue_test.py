@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+
+from arena_game_service import ServiceResult
+from command_queue import CommandQueue
+
+
+class FakeService:
+    """Records calls and answers them from a script of HTTP statuses."""
+
+    def __init__(self, statuses=None, gate=None):
+        self.calls = []
+        self.times = []
+        self.statuses = list(statuses or [])
+        # While set, every call blocks until it is released
+        self.gate = gate
+        self.entered = threading.Event()
+
+    def _answer(self, kind, args):
+        self.calls.append((kind, args))
+        self.times.append(time.monotonic())
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status >= 400:
+            return ServiceResult(False, error=f"status {status}", status=status)
+        return ServiceResult(True, dict(args), status=status)
+
+    def boost_player(self, game_id, player_id, amount, username):
+        return self._answer("boost_player", {"game_id": game_id, "player_id": player_id, "amount": amount, "username": username})
+
+    def drop_immediate_item(self, game_id, item_id, target_player):
+        return self._answer("drop_immediate_item", {"game_id": game_id, "item_id": item_id, "target_player": target_player})
+
+
+class MaxJitter:
+    """Always picks the longest backoff, so retry timing is predictable."""
+
+    def uniform(self, low, high):
+        return high
+
+
+def make_queue(service, **options):
+    options.setdefault("rate", 1000.0)
+    options.setdefault("burst", 1000)
+    options.setdefault("base_backoff", 0.01)
+    return CommandQueue(service, rng=random.Random(0), **options)
+
+
+def test_coalesced_boosts_are_summed_and_share_one_result():
+    service = FakeService()
+    queue = make_queue(service)
+    # Queued before the worker starts, so all of them land inside the window
+    futures = [queue.boost_player("g", "p1", amount, f"viewer{amount}") for amount in (1, 2, 3)]
+    other = queue.boost_player("g", "p2", 7, "solo")
+    queue.start()
+    queue.stop()
+    results = [future.result(5) for future in futures]
+    assert all(result is results[0] for result in results)
+    assert results[0].data == {"game_id": "g", "player_id": "p1", "amount": 6, "username": "viewer3"}
+    assert other.result(5).data["amount"] == 7
+    assert len(service.calls) == 2
+    assert (queue.stats.queued, queue.stats.coalesced, queue.stats.sent) == (4, 2, 2)
+
+
+def test_drops_are_never_coalesced():
+    service = FakeService()
+    queue = make_queue(service)
+    futures = [queue.drop_immediate_item("g", "shield", "p1") for _ in range(3)]
+    queue.start()
+    queue.stop()
+    assert all(future.result(5).success for future in futures)
+    assert [kind for kind, _ in service.calls] == ["drop_immediate_item"] * 3
+    assert queue.stats.coalesced == 0
+
+
+def test_retries_after_503_then_succeeds():
+    service = FakeService(statuses=[503])
+    queue = make_queue(service)
+    future = queue.drop_immediate_item("g", "shield", "p1")
+    queue.start()
+    result = future.result(5)
+    queue.stop()
+    assert result.success and result.status == 200
+    assert len(service.calls) == 2
+    assert (queue.stats.retries, queue.stats.failed) == (1, 0)
+
+
+def test_retries_stop_at_max_retries():
+    service = FakeService(statuses=[503, 429, 502, 500])
+    queue = make_queue(service, max_retries=2)
+    future = queue.boost_player("g", "p1", 1, "viewer")
+    queue.start()
+    result = future.result(5)
+    queue.stop()
+    assert not result.success and result.status == 502
+    assert len(service.calls) == 3
+    assert (queue.stats.retries, queue.stats.failed) == (2, 1)
+
+
+def test_client_errors_are_not_retried():
+    service = FakeService(statuses=[400])
+    queue = make_queue(service)
+    future = queue.drop_immediate_item("g", "shield", "p1")
+    queue.start()
+    assert future.result(5).status == 400
+    queue.stop()
+    assert len(service.calls) == 1
+
+
+def test_drain_skips_the_coalesce_window_but_not_the_backoff():
+    service = FakeService(statuses=[503])
+    queue = CommandQueue(service, rate=1000.0, burst=1000, coalesce_window=30.0, base_backoff=0.3, rng=MaxJitter())
+    boost = queue.boost_player("g", "p1", 1, "viewer")
+    queue.start()
+    started = time.monotonic()
+    queue.stop(timeout=5)
+    assert boost.result(0).success
+    assert len(service.calls) == 2
+    assert service.times[0] - started < 0.2
+    assert service.times[1] - service.times[0] >= 0.3
+
+
+def test_non_draining_stop_cancels_queued_commands():
+    service = FakeService()
+    queue = make_queue(service, coalesce_window=30.0)
+    queue.start()
+    boosts = [queue.boost_player("g", "p1", 1, "viewer") for _ in range(2)]
+    queue.stop(drain=False, timeout=5)
+    assert all(future.cancelled() for future in boosts)
+    assert service.calls == []
+    assert queue.thread is None
+
+
+def test_start_after_timed_out_stop_keeps_one_worker():
+    gate = threading.Event()
+    service = FakeService(gate=gate)
+    queue = make_queue(service)
+    first = queue.drop_immediate_item("g", "a", "p1")
+    queue.start()
+    assert service.entered.wait(5)
+    worker = queue.thread
+    queue.stop(timeout=0.05)
+    # Still inside the blocked call, so the worker must still be the one on record
+    assert queue.thread is worker and worker.is_alive()
+    queue.start()
+    second = queue.drop_immediate_item("g", "b", "p1")
+    assert queue.thread is worker
+    gate.set()
+    assert first.result(5).success and second.result(5).success
+    assert sum(thread.name == "arena-commands" for thread in threading.enumerate()) == 1
+    queue.stop(timeout=5)
+    assert queue.thread is None and not worker.is_alive()
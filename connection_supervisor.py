@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import socketio  # python-socketio client
+
+
+@dataclass
+class SupervisorStats:
+    connects: int = 0
+    # Connections made after one was lost
+    reconnects: int = 0
+    failed_attempts: int = 0
+    disconnects: int = 0
+    resyncs: int = 0
+    heartbeats: int = 0
+    missed_heartbeats: int = 0
+    # Smoothed and most recent heartbeat round trip, in seconds
+    latency: Optional[float] = None
+    last_latency: Optional[float] = None
+    buffered_dropped: int = 0
+
+
+class ConnectionSupervisor:
+    """Keeps an ArenaGameService's websocket connected for as long as it runs.
+
+    A background thread connects, and after every lost connection tries again
+    with exponential backoff and jitter until stop(). Once reconnected it
+    refreshes service.game_state from get_game_details, since events sent
+    while we were away are gone, then sends the emits buffered in the
+    meantime. With a heartbeat_event the server is asked for an ack every
+    heartbeat_interval seconds to track latency, and max_missed acks in a row
+    drop the connection so it is rebuilt; without one, engine.io's own ping
+    timeout is what notices a dead connection.
+    """
+
+    def __init__(self, service: Any, ws_url: Optional[str] = None, *, base_delay: float = 1.0, max_delay: float = 30.0, heartbeat_event: Optional[str] = None, heartbeat_interval: float = 15.0, heartbeat_timeout: float = 10.0, max_missed: int = 2, max_buffered: int = 256, rng: Optional[random.Random] = None, clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self.ws_url = ws_url
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heartbeat_event = heartbeat_event
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_missed = max_missed
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.stats = SupervisorStats()
+
+        # Emits made while disconnected, oldest first; the oldest go once it is full
+        self.outbox: Deque[Tuple[str, Any]] = deque(maxlen=max_buffered)
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = False
+        self.attempts = 0
+        self.missed = 0
+        self.was_connected = False
+        self.next_heartbeat = 0.0
+
+        # Called with the refreshed game state after each resync (assign from outside as needed)
+        self.on_resync: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.service.sio.connected
+
+    def start(self) -> None:
+        with self.condition:
+            # A supervisor still finishing after a timed out stop() just carries on
+            self.stopping = False
+            if self.thread is not None:
+                self.condition.notify()
+                return
+            # Reconnection is ours, python-socketio would otherwise race us with its own
+            self.service.sio.reconnection = False
+            self.thread = threading.Thread(target=self._run, name="arena-supervisor", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout: Optional[float] = 5) -> None:
+        """Stop supervising, waiting up to timeout for the thread to exit.
+
+        The thread clears self.thread itself once it exits, so one still in a
+        heartbeat or connect after the timeout keeps running and a later
+        start() does not add a second one.
+        """
+        with self.condition:
+            if self.thread is None:
+                return
+            self.stopping = True
+            self.condition.notify()
+            thread = self.thread
+        thread.join(timeout)
+
+    def connection_changed(self) -> None:
+        # Called from the socket's connect and disconnect handlers
+        with self.condition:
+            if not self.connected and self.was_connected:
+                self.stats.disconnects += 1
+            self.condition.notify()
+
+    def emit(self, event: str, data: Any = None) -> bool:
+        """Send an event now if connected, else buffer it. Returns True if sent."""
+        with self.condition:
+            if self.connected and not self.outbox:
+                try:
+                    self.service.sio.emit(event, data)
+                    return True
+                except socketio.exceptions.SocketIOError:
+                    pass
+            if len(self.outbox) == self.outbox.maxlen:
+                self.stats.buffered_dropped += 1
+            self.outbox.append((event, data))
+            self.condition.notify()
+            return False
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                if self.stopping:
+                    self.thread = None
+                    return
+            if not self.connected:
+                self._connect()
+                continue
+            if self.outbox:
+                self._flush()
+            wait = self.heartbeat_interval
+            if self.heartbeat_event:
+                wait = self.next_heartbeat - self.clock()
+                if wait <= 0:
+                    self._heartbeat()
+                    continue
+            with self.condition:
+                if not self.stopping and self.connected and not self.outbox:
+                    self.condition.wait(wait)
+
+    def _connect(self) -> None:
+        if self.service.sio.eio.state != "disconnected":
+            # Half open after a failure, clear it out before trying again
+            try:
+                self.service.sio.disconnect()
+            except socketio.exceptions.SocketIOError:
+                pass
+        if self.service.connect_websocket(self.ws_url):
+            self.stats.connects += 1
+            if self.was_connected:
+                self.stats.reconnects += 1
+            self.attempts = 0
+            self.missed = 0
+            self.next_heartbeat = self.clock() + self.heartbeat_interval
+            if self.was_connected:
+                self._resync()
+            self.was_connected = True
+            return
+        self.stats.failed_attempts += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** self.attempts)
+        self.attempts += 1
+        with self.condition:
+            if not self.stopping:
+                # Half to all of the delay, so clients dropped together do not return together
+                self.condition.wait(self.rng.uniform(delay / 2, delay))
+
+    def _resync(self) -> None:
+        state = self.service.game_state
+        game_id = state.get("gameId") if isinstance(state, dict) else None
+        if not game_id:
+            return
+        # Whatever is cached predates the outage
+        self.service.cache.invalidate(("game_details", game_id))
+        result = self.service.get_game_details(game_id)
+        if not result.success or not isinstance(result.data, dict):
+            if self.service.debug:
+                print("[arena] Resync failed:", result.error)
+            return
+        # Keep fields only init returned, such as the websocket URL
+        self.service.game_state = {**state, **result.data}
+        self.stats.resyncs += 1
+        if self.on_resync:
+            self.on_resync(self.service.game_state)
+
+    def _flush(self) -> None:
+        with self.condition:
+            while self.outbox and self.connected:
+                event, data = self.outbox[0]
+                try:
+                    self.service.sio.emit(event, data)
+                except socketio.exceptions.SocketIOError:
+                    return
+                self.outbox.popleft()
+
+    def _heartbeat(self) -> None:
+        self.next_heartbeat = self.clock() + self.heartbeat_interval
+        start = self.clock()
+        try:
+            self.service.sio.call(self.heartbeat_event, timeout=self.heartbeat_timeout)
+        except socketio.exceptions.TimeoutError:
+            self.stats.missed_heartbeats += 1
+            self.missed += 1
+            if self.missed >= self.max_missed:
+                # Connected on paper only, drop it and let _run build a new one
+                self.service.sio.disconnect()
+            return
+        except socketio.exceptions.SocketIOError:
+            return
+        latency = self.clock() - start
+        self.missed = 0
+        self.stats.heartbeats += 1
+        self.stats.last_latency = latency
+        self.stats.latency = latency if self.stats.latency is None else 0.8 * self.stats.latency + 0.2 * latency
@@ -0,0 +1,196 @@
+import asyncio
+import socket
+import threading
+import time
+
+import socketio
+from aiohttp import web
+
+from arena_game_service import ArenaGameService
+
+
+class ArenaStandIn:
+    """Local socket.io and game details server that can drop or refuse connections on demand."""
+
+    def __init__(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.received = []
+        self.version = 1
+        # Seconds the heartbeat ack is held back, past the client's timeout it is a missed beat
+        self.heartbeat_delay = 0.0
+        self.heartbeat_calls = 0
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.runner = None
+        self.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(10)
+
+    def start(self):
+        async def start():
+            self.sio = socketio.AsyncServer(async_mode="aiohttp")
+            app = web.Application()
+            app.router.add_get("/games/{game_id}", self._game_details)
+            self.sio.attach(app)
+
+            @self.sio.on("*")
+            async def any_event(event, sid, data=None):
+                self.received.append((event, data))
+
+            @self.sio.on("heartbeat")
+            async def heartbeat(sid, data=None):
+                self.heartbeat_calls += 1
+                await asyncio.sleep(self.heartbeat_delay)
+                return "pong"
+
+            # Short enough that stop() cuts live connections off rather than waiting on them
+            self.runner = web.AppRunner(app, shutdown_timeout=0.1)
+            await self.runner.setup()
+            await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+        self._run(start())
+
+    def stop(self):
+        async def stop():
+            await self.sio.shutdown()
+            await self.runner.cleanup()
+
+        self._run(stop())
+
+    def drop_connections(self):
+        async def drop():
+            for sid in list(self.sio.manager.get_participants("/", None)):
+                await self.sio.disconnect(sid[0])
+
+        self._run(drop())
+
+    def connection_count(self):
+        return len(list(self.sio.manager.get_participants("/", None)))
+
+    async def _game_details(self, request):
+        return web.json_response({"data": {"gameId": request.match_info["game_id"], "version": self.version}})
+
+    def close(self):
+        self.stop()
+
+        async def cancel_leftovers():
+            # Ping tasks of dropped sockets outlive the server
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self._run(cancel_leftovers())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def make_service(server):
+    arena = ArenaGameService(base_api_url=server.url, socket_url=server.url)
+    arena.game_state = {"gameId": "g1", "websocketUrl": server.url}
+    return arena
+
+
+def test_reconnects_and_resyncs_after_drop():
+    server = ArenaStandIn()
+    arena = make_service(server)
+    try:
+        supervisor = arena.supervise(base_delay=0.05, max_delay=0.2)
+        wait_until(lambda: arena.sio.connected)
+        server.version = 2
+        server.drop_connections()
+        wait_until(lambda: supervisor.stats.resyncs == 1)
+        assert arena.sio.connected
+        assert supervisor.stats.reconnects == 1 and supervisor.stats.disconnects == 1
+        assert arena.game_state == {"gameId": "g1", "websocketUrl": server.url, "version": 2}
+    finally:
+        arena.disconnect()
+        server.close()
+
+
+def test_backs_off_while_down_and_flushes_buffered_emits():
+    server = ArenaStandIn()
+    arena = make_service(server)
+    try:
+        supervisor = arena.supervise(base_delay=0.05, max_delay=0.2)
+        wait_until(lambda: arena.sio.connected)
+        server.stop()
+        wait_until(lambda: not arena.sio.connected)
+        assert not arena.emit("vote", 1)
+        assert not arena.emit("vote", 2)
+        wait_until(lambda: supervisor.stats.failed_attempts >= 2)
+        server.start()
+        wait_until(lambda: len(server.received) == 2)
+        assert server.received == [("vote", 1), ("vote", 2)]
+        assert supervisor.stats.reconnects == 1
+        assert arena.emit("vote", 3)
+        wait_until(lambda: len(server.received) == 3)
+    finally:
+        arena.disconnect()
+        server.close()
+
+
+def test_heartbeats_track_latency_and_missed_beats_reconnect():
+    server = ArenaStandIn()
+    arena = make_service(server)
+    try:
+        supervisor = arena.supervise(base_delay=0.05, heartbeat_event="heartbeat", heartbeat_interval=0.05, heartbeat_timeout=0.2, max_missed=2)
+        wait_until(lambda: supervisor.stats.heartbeats >= 3)
+        assert 0 < supervisor.stats.latency < 0.2
+        server.heartbeat_delay = 1.0
+        wait_until(lambda: supervisor.stats.reconnects == 1)
+        assert supervisor.stats.missed_heartbeats >= 2
+    finally:
+        arena.disconnect()
+        server.close()
+
+
+def test_start_after_timed_out_stop_keeps_one_supervisor():
+    server = ArenaStandIn()
+    arena = make_service(server)
+    try:
+        supervisor = arena.supervise(base_delay=0.05, heartbeat_event="heartbeat", heartbeat_interval=0.05, heartbeat_timeout=5.0)
+        wait_until(lambda: supervisor.stats.heartbeats >= 1)
+        server.heartbeat_delay = 1.0
+        calls = server.heartbeat_calls
+        wait_until(lambda: server.heartbeat_calls > calls)
+        worker = supervisor.thread
+        # Still waiting on the heartbeat ack, so the supervisor must stay the one on record
+        supervisor.stop(timeout=0.05)
+        assert supervisor.thread is worker and worker.is_alive()
+        assert arena.supervise() is supervisor
+        assert supervisor.thread is worker
+        server.heartbeat_delay = 0.0
+        heartbeats = supervisor.stats.heartbeats
+        wait_until(lambda: supervisor.stats.heartbeats > heartbeats + 1)
+        assert sum(thread.name == "arena-supervisor" for thread in threading.enumerate()) == 1
+        assert supervisor.stats.connects == 1
+        arena.disconnect()
+        assert supervisor.thread is None and not worker.is_alive()
+    finally:
+        arena.disconnect()
+        server.close()
+
+
+def test_disconnect_stops_reconnecting():
+    server = ArenaStandIn()
+    arena = make_service(server)
+    try:
+        arena.supervise(base_delay=0.05)
+        wait_until(lambda: server.connection_count() == 1)
+        arena.disconnect()
+        time.sleep(0.3)
+        assert not arena.sio.connected
+        assert server.connection_count() == 0
+    finally:
+        server.close()
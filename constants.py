@@ -1,10 +1,16 @@
 ROWS = 15
 COLS = 15
 TILE_SIZE = 48
+#tile id of the grass turrets can be built on
+GRASS_TILE = 7
 SIDE_PANEL = 300
 SCREEN_WIDTH = TILE_SIZE * COLS
 SCREEN_HEIGHT = TILE_SIZE * ROWS
 FPS = 60
+SIM_RATE = 60 #fixed simulation steps per simulated second
+SIM_STEP_MS = 1000 / SIM_RATE
+MAX_STEPS_PER_FRAME = 64 #catch-up limit before the simulation drops the backlog
+FAST_FORWARD_SPEED = 2 #simulation steps run per step of real time while fast forwarding
 HEALTH = 100
 MONEY = 650
 TOTAL_LEVELS = 15
@@ -20,4 +26,17 @@ KILL_REWARD = 1
 LEVEL_COMPLETE_REWARD = 100
 ANIMATION_STEPS = 8
 ANIMATION_DELAY = 15
-DAMAGE = 5
\ No newline at end of file
+DAMAGE = 5
+
+#rendering constants
+ROTATION_RESOLUTION = 1 #degrees between cached rotations
+ROTATION_CACHE_SIZE = 2048 #rotated surfaces kept before the least recently used are dropped
+DIRTY_RENDERING = True #only push changed screen areas instead of flipping the whole window
+
+#replay constants
+REPLAY_FILE = "last_replay.json" #action log of the last game, written on quit
+
+#profiler constants
+PROFILER_WINDOW = 300 #frames kept for the rolling percentiles
+PROFILER_TRACE_FILE = "profile_trace.csv" #per-frame trace, use a .json name for JSON
+PROFILER_STATS_FILE = "profile_session.prof" #cProfile stats for pstats/snakeviz
\ No newline at end of file
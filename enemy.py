@@ -1,61 +1,102 @@
 import pygame as pg
 from pygame.math import Vector2
-import math
 import constants as c
-from enemy_data import ENEMY_DATA
-
-class Enemy(pg.sprite.Sprite):
-  def __init__(self, enemy_type, waypoints, images):
-    pg.sprite.Sprite.__init__(self)
-    self.waypoints = waypoints
-    self.pos = Vector2(self.waypoints[0])
-    self.target_waypoint = 1
-    self.health = ENEMY_DATA.get(enemy_type)["health"]
-    self.speed = ENEMY_DATA.get(enemy_type)["speed"]
+from entity import SlottedSprite, ENEMY_STATS
+from rotation_cache import rotation_cache
+
+class Enemy(SlottedSprite):
+  __slots__ = (
+    "enemy_type", "path", "distance", "segment", "pos", "prev_pos", "health", "speed",
+    "angle", "original_image", "image_angle", "image", "rect", "pool",
+  )
+
+  def __init__(self, enemy_type, path, images):
+    SlottedSprite.__init__(self)
+    #set by a Pool that hands this enemy out again after it is killed
+    self.pool = None
+    self.pos = Vector2()
+    #position at the previous simulation step, used to interpolate drawing
+    self.prev_pos = Vector2()
+    self.rect = None
+    self.reset(enemy_type, path, images)
+
+  def reset(self, enemy_type, path, images):
+    #start over at the beginning of the path, reusing the vectors and rect
+    self.enemy_type = enemy_type
+    self.path = path
+    #distance travelled along the path is the only movement state, pos is derived from it
+    self.distance = 0.0
+    self.segment = 0
+    self.pos.update(self.path.points[0])
+    self.prev_pos.update(self.pos)
+    stats = ENEMY_STATS[enemy_type]
+    self.health = stats.health
+    self.speed = stats.speed
     self.angle = 0
-    self.original_image = images.get(enemy_type)
-    self.image = pg.transform.rotate(self.original_image, self.angle)
-    self.rect = self.image.get_rect()
+    #headless simulations pass no images and never touch pg.transform
+    self.original_image = images.get(enemy_type) if images else None
+    self.image_angle = rotation_cache.quantize(self.angle)
+    if self.original_image:
+      self.image = rotation_cache.get(self.original_image, self.image_angle)
+      size = self.image.get_size()
+    else:
+      self.image = None
+      size = (0, 0)
+    if self.rect is None:
+      self.rect = pg.Rect((0, 0), size)
+    else:
+      self.rect.size = size
     self.rect.center = self.pos
 
+  @property
+  def target_waypoint(self):
+    #index of the waypoint the enemy is heading for
+    return self.segment + 1
+
   def update(self, world):
     self.move(world)
     self.rotate()
     self.check_alive(world)
 
   def move(self, world):
-    #define a target waypoint
-    if self.target_waypoint < len(self.waypoints):
-      self.target = Vector2(self.waypoints[self.target_waypoint])
-      self.movement = self.target - self.pos
-    else:
+    self.prev_pos.update(self.pos)
+    self.distance += self.speed * world.step_scale
+    if self.distance >= self.path.length:
       #enemy has reached the end of the path
       self.kill()
       world.health -= 1
       world.missed_enemies += 1
-
-    #calculate distance to target
-    dist = self.movement.length()
-    #check if remaining distance is greater than the enemy speed
-    if dist >= (self.speed * world.game_speed):
-      self.pos += self.movement.normalize() * (self.speed * world.game_speed)
-    else:
-      if dist != 0:
-        self.pos += self.movement.normalize() * dist
-      self.target_waypoint += 1
+      self.distance = self.path.length
+    #advance the segment cursor and look up the new position
+    self.segment = self.path.segment_at(self.distance, self.segment)
+    self.pos.update(self.path.position_at(self.distance, self.segment))
 
   def rotate(self):
-    #calculate distance to next waypoint
-    dist = self.target - self.pos
-    #use distance to calculate angle
-    self.angle = math.degrees(math.atan2(-dist[1], dist[0]))
-    #rotate image and update rectangle
-    self.image = pg.transform.rotate(self.original_image, self.angle)
-    self.rect = self.image.get_rect()
+    #face along the current path segment
+    self.angle = self.path.angles[self.segment]
+    if self.original_image is None:
+      return
+    #only swap the image and rebuild the rect when the quantized angle changes
+    image_angle = rotation_cache.quantize(self.angle)
+    if image_angle != self.image_angle:
+      self.image_angle = image_angle
+      self.image = rotation_cache.get(self.original_image, image_angle)
+      self.rect = self.image.get_rect()
     self.rect.center = self.pos
 
+  def interpolate(self, alpha):
+    #draw part way between the last two simulation steps
+    self.rect.center = self.prev_pos.lerp(self.pos, alpha)
+
   def check_alive(self, world):
     if self.health <= 0:
       world.killed_enemies += 1
       world.money += c.KILL_REWARD
-      self.kill()
\ No newline at end of file
+      self.kill()
+
+  def kill(self):
+    #hand the enemy back to its pool the first time it leaves play
+    released = self.pool is not None and self.alive()
+    SlottedSprite.kill(self)
+    if released:
+      self.pool.release(self)
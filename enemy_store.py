@@ -0,0 +1,181 @@
+import numpy as np
+import pygame as pg
+import constants as c
+from entity import SlottedSprite, ENEMY_STATS
+from rotation_cache import rotation_cache
+
+class EnemyStore():
+  """Structure-of-arrays enemy state advanced in one batched step per tick.
+
+  Distances along the path, positions, speeds and health live in NumPy
+  arrays and every live enemy follows the WaypointPath in a single
+  vectorised update. The sprites handed out by spawn() are thin views over
+  a slot in the arrays, so turrets and groups use them like Enemy sprites.
+  """
+  def __init__(self, path, capacity = 256):
+    self.path = path
+    self.points = np.array(path.points, dtype = float)
+    self.distances = np.array(path.distances, dtype = float)
+    self.directions = np.array(path.directions, dtype = float)
+    self.angles = np.array(path.angles, dtype = float)
+    self.capacity = 0
+    self.distance = np.zeros(0)
+    self.pos = np.zeros((0, 2))
+    self.prev_pos = np.zeros((0, 2))
+    self.speed = np.zeros(0)
+    self.health = np.zeros(0)
+    self.angle = np.zeros(0)
+    self.alive = np.zeros(0, dtype = bool)
+    self.sprites = []
+    self.free_slots = []
+    self.grow(capacity)
+
+  def grow(self, capacity):
+    extra = capacity - self.capacity
+    self.distance = np.concatenate((self.distance, np.zeros(extra)))
+    self.pos = np.concatenate((self.pos, np.zeros((extra, 2))))
+    self.prev_pos = np.concatenate((self.prev_pos, np.zeros((extra, 2))))
+    self.speed = np.concatenate((self.speed, np.zeros(extra)))
+    self.health = np.concatenate((self.health, np.zeros(extra)))
+    self.angle = np.concatenate((self.angle, np.zeros(extra)))
+    self.alive = np.concatenate((self.alive, np.zeros(extra, dtype = bool)))
+    self.sprites.extend([None] * extra)
+    #hand out low slots first so live enemies stay packed at the front
+    self.free_slots = list(range(capacity - 1, self.capacity - 1, -1)) + self.free_slots
+    self.capacity = capacity
+
+  def spawn(self, enemy_type, images = None):
+    if not self.free_slots:
+      self.grow(self.capacity * 2)
+    index = self.free_slots.pop()
+    enemy_stats = ENEMY_STATS[enemy_type]
+    self.distance[index] = 0
+    self.pos[index] = self.points[0]
+    self.prev_pos[index] = self.points[0]
+    self.speed[index] = enemy_stats.speed
+    self.health[index] = enemy_stats.health
+    self.angle[index] = 0
+    self.alive[index] = True
+    #each slot keeps its sprite view so respawning into it allocates nothing
+    image = images.get(enemy_type) if images else None
+    sprite = self.sprites[index]
+    if sprite is None:
+      sprite = StoreEnemy(self, index, enemy_type, image)
+      self.sprites[index] = sprite
+    else:
+      sprite.reset(enemy_type, image)
+    return sprite
+
+  def release(self, index):
+    self.alive[index] = False
+    self.free_slots.append(index)
+
+  def clear(self):
+    for index in np.flatnonzero(self.alive):
+      self.sprites[index].kill()
+      self.release(index)
+
+  def update(self, world):
+    live = np.flatnonzero(self.alive)
+    if len(live) == 0:
+      return
+    self.prev_pos[live] = self.pos[live]
+    #advance everyone along the path
+    distance = self.distance[live] + self.speed[live] * world.step_scale
+    #enemies past the end of the path leave the map and cost the player health
+    reached_end = distance >= self.path.length
+    finished = live[reached_end]
+    distance[reached_end] = self.path.length
+    self.distance[live] = distance
+
+    #look up each enemy's segment and turn distance into position and heading
+    segment = np.searchsorted(self.distances, distance, side = "right") - 1
+    segment = np.clip(segment, 0, self.path.segment_count - 1)
+    along = distance - self.distances[segment]
+    self.pos[live] = self.points[segment] + self.directions[segment] * along[:, None]
+    self.angle[live] = self.angles[segment]
+
+    world.health -= len(finished)
+    world.missed_enemies += len(finished)
+    dead = live[self.health[live] <= 0]
+    world.killed_enemies += len(dead)
+    world.money += c.KILL_REWARD * len(dead)
+
+    for index in np.union1d(finished, dead):
+      self.sprites[index].kill()
+      self.release(index)
+    self.sync_sprites()
+
+  def interpolate(self, alpha):
+    #draw every sprite part way between the last two simulation steps
+    live = np.flatnonzero(self.alive)
+    centers = (self.prev_pos[live] + (self.pos[live] - self.prev_pos[live]) * alpha).tolist()
+    for index, center in zip(live, centers):
+      self.sprites[index].rect.center = center
+
+  def sync_sprites(self):
+    #refresh the drawable image and rect of every sprite that has one
+    for index in np.flatnonzero(self.alive):
+      sprite = self.sprites[index]
+      if sprite.original_image is not None:
+        sprite.rotate()
+
+class StoreEnemy(SlottedSprite):
+  """Sprite view of one EnemyStore slot, used for drawing and targeting."""
+  __slots__ = ("store", "index", "enemy_type", "original_image", "image_angle", "image", "rect")
+
+  def __init__(self, store, index, enemy_type, image):
+    SlottedSprite.__init__(self)
+    self.store = store
+    self.index = index
+    self.rect = None
+    self.reset(enemy_type, image)
+
+  def reset(self, enemy_type, image):
+    self.enemy_type = enemy_type
+    self.original_image = image
+    self.image_angle = rotation_cache.quantize(0)
+    if image:
+      self.image = image
+      size = image.get_size()
+    else:
+      self.image = None
+      size = (0, 0)
+    if self.rect is None:
+      self.rect = pg.Rect((0, 0), size)
+    else:
+      self.rect.size = size
+    self.rect.center = tuple(self.store.pos[self.index])
+
+  @property
+  def pos(self):
+    return self.store.pos[self.index]
+
+  @property
+  def distance(self):
+    return self.store.distance[self.index]
+
+  @property
+  def health(self):
+    return self.store.health[self.index]
+
+  @health.setter
+  def health(self, value):
+    self.store.health[self.index] = value
+
+  @property
+  def angle(self):
+    return self.store.angle[self.index]
+
+  def update(self, world):
+    #movement is done in bulk by EnemyStore.update
+    pass
+
+  def rotate(self):
+    #only swap the image and rebuild the rect when the quantized angle changes
+    image_angle = rotation_cache.quantize(self.angle)
+    if image_angle != self.image_angle:
+      self.image_angle = image_angle
+      self.image = rotation_cache.get(self.original_image, image_angle)
+      self.rect = self.image.get_rect()
+    self.rect.center = tuple(self.pos)
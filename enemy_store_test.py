@@ -0,0 +1,52 @@
+import os
+import json
+import constants as c
+from simulation import Simulation
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level.tmj")
+WAVES = 6
+STEP_MS = 1000 / c.FPS
+
+with open(LEVEL) as file:
+  WORLD_DATA = json.load(file)
+
+def summary(sim):
+  world = sim.world
+  return (world.level, world.health, world.money, world.spawned_enemies, world.killed_enemies, world.missed_enemies, sim.game_over)
+
+def play(use_enemy_store, seed, spacing):
+  """Play a few waves with a sparse mix of turrets, returning summaries taken along the way."""
+  sim = Simulation(WORLD_DATA, seed = seed, use_enemy_store = use_enemy_store)
+  sim.world.money = 10 ** 6
+  grass = [tile_num for tile_num, tile in enumerate(sim.world.tile_map) if tile == 7]
+  for tile_num in grass[::spacing]:
+    sim.create_turret(tile_num % c.COLS, tile_num // c.COLS)
+  turrets = sorted(sim.turret_group, key = lambda turret: (turret.tile_y, turret.tile_x))
+  for index, turret in enumerate(turrets):
+    turret.targeting = ("order", "first", "last")[index % 3]
+  summaries = []
+  steps = 0
+  for wave in range(WAVES):
+    if wave == 2:
+      for turret in turrets[::2]:
+        sim.upgrade_turret(turret)
+    sim.begin_level()
+    #sample mid-wave too, the per-wave kill and leak counters reset when a wave ends
+    while not sim.game_over and sim.world.level == wave + 1:
+      sim.step(STEP_MS)
+      steps += 1
+      if steps % 100 == 0:
+        summaries.append(summary(sim))
+    summaries.append(summary(sim))
+    if sim.game_over:
+      break
+  return summaries
+
+def test_store_matches_sprites():
+  for seed, spacing in ((1, 9), (2, 14)):
+    sprites = play(False, seed, spacing)
+    store = play(True, seed, spacing)
+    assert sprites == store
+    #the games should both kill and leak enemies for the comparison to mean much
+    assert any(killed for level, health, money, spawned, killed, missed, over in sprites)
+    assert any(missed for level, health, money, spawned, killed, missed, over in sprites)
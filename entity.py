@@ -0,0 +1,54 @@
+from enemy_data import ENEMY_DATA
+from turret_data import TURRET_DATA
+
+class SlottedSprite():
+  """Sprite protocol for classes that declare __slots__.
+
+  pg.sprite.Sprite gives every instance a __dict__ and a set of groups,
+  which adds up with thousands of enemies. pygame groups accept any object
+  with add_internal/remove_internal, so this base keeps the groups in a
+  tuple (almost always zero or one of them) and lets subclasses go without
+  a __dict__.
+  """
+  __slots__ = ("sprite_groups",)
+
+  def __init__(self):
+    self.sprite_groups = ()
+
+  def add_internal(self, group):
+    self.sprite_groups += (group,)
+
+  def remove_internal(self, group):
+    self.sprite_groups = tuple(g for g in self.sprite_groups if g is not group)
+
+  def update(self, *args, **kwargs):
+    pass
+
+  def kill(self):
+    for group in self.sprite_groups:
+      group.remove_internal(self)
+    self.sprite_groups = ()
+
+  def alive(self):
+    return bool(self.sprite_groups)
+
+  def groups(self):
+    return list(self.sprite_groups)
+
+class EnemyStats():
+  __slots__ = ("health", "speed")
+
+  def __init__(self, health, speed):
+    self.health = health
+    self.speed = speed
+
+class TurretStats():
+  __slots__ = ("range", "cooldown")
+
+  def __init__(self, range, cooldown):
+    self.range = range
+    self.cooldown = cooldown
+
+#per type and per upgrade level stats, read once and shared by every entity
+ENEMY_STATS = {enemy_type: EnemyStats(**data) for enemy_type, data in ENEMY_DATA.items()}
+TURRET_STATS = [TurretStats(**data) for data in TURRET_DATA]
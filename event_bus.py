@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, FrozenSet, Optional, Set
+
+# Progress ticks where only the newest value matters
+COALESCED_EVENTS = frozenset({"countdown_update", "boost_cycle_update"})
+
+
+@dataclass
+class ArenaEvent:
+    name: str
+    data: Any
+    # Monotonic time the socket delivered it
+    received_at: float
+
+
+@dataclass
+class EventBusStats:
+    published: int = 0
+    delivered: int = 0
+    # Events replaced by a newer one of the same name before they were drained
+    coalesced: int = 0
+    dropped: int = 0
+    errors: int = 0
+    max_depth: int = 0
+    # Age of the oldest event handed out by the last drain, in seconds
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+
+
+class EventBus:
+    """Hands socket events from the receive thread to the game loop.
+
+    publish() is called on the socket thread and never blocks or runs user
+    code. drain() is called once per frame on the game thread and delivers
+    events in arrival order until its time budget runs out, so callbacks can
+    touch game state without locking.
+
+    Only deque appends and pops and single dict operations are shared between
+    the two threads, each atomic under the GIL, so neither side takes a lock.
+    A coalesced event keeps a single marker in the queue while its newest
+    payload waits in `latest`; drain() picks up whatever is newest when it
+    reaches the marker. Past max_events the oldest event is dropped, or with
+    overflow="drop_newest" the incoming one.
+    """
+
+    def __init__(self, max_events: int = 1024, *, coalesce: FrozenSet[str] = COALESCED_EVENTS, overflow: str = "drop_oldest", clock: Callable[[], float] = time.monotonic):
+        if overflow not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"unknown overflow policy {overflow}")
+        self.max_events = max_events
+        self.coalesce = coalesce
+        self.overflow = overflow
+        self.clock = clock
+        self.queue: Deque[Any] = deque()
+        # Newest payload of each coalesced event, and which of them have a marker queued
+        self.latest: Dict[str, ArenaEvent] = {}
+        self.marked: Set[str] = set()
+        self.stats = EventBusStats()
+
+    def publish(self, name: str, data: Any = None) -> None:
+        event = ArenaEvent(name, data, self.clock())
+        self.stats.published += 1
+        if name in self.coalesce:
+            previous = self.latest.get(name)
+            if previous is not None:
+                # Keep the older timestamp so lag still counts from the first unread tick
+                event.received_at = previous.received_at
+            self.latest[name] = event
+            if name in self.marked:
+                self.stats.coalesced += 1
+                return
+            self.marked.add(name)
+            # The marker is the name itself, drain() looks the payload up
+            item: Any = name
+        else:
+            item = event
+        if len(self.queue) >= self.max_events:
+            if self.overflow == "drop_newest":
+                self._discard(item)
+                return
+            try:
+                self._discard(self.queue.popleft())
+            except IndexError:
+                pass
+        self.queue.append(item)
+        depth = len(self.queue)
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+
+    def _discard(self, item: Any) -> None:
+        self.stats.dropped += 1
+        if isinstance(item, str):
+            self.marked.discard(item)
+            self.latest.pop(item, None)
+
+    def _next(self) -> Optional[ArenaEvent]:
+        while True:
+            try:
+                item = self.queue.popleft()
+            except IndexError:
+                return None
+            if not isinstance(item, str):
+                return item
+            # Unmark before taking the payload so a newer tick queues a new marker
+            self.marked.discard(item)
+            event = self.latest.pop(item, None)
+            if event is not None:
+                return event
+
+    def drain(self, handler: Callable[[ArenaEvent], Any], budget: Optional[float] = 0.004, max_events: Optional[int] = None) -> int:
+        """Deliver queued events to handler, returning how many were delivered.
+
+        Stops once budget seconds have been spent (at least one event is always
+        delivered) or after max_events. A handler that raises is reported and
+        skipped rather than stopping the frame.
+        """
+        start = self.clock()
+        delivered = 0
+        lag = 0.0
+        while max_events is None or delivered < max_events:
+            event = self._next()
+            if event is None:
+                break
+            lag = max(lag, start - event.received_at)
+            try:
+                handler(event)
+            except Exception:
+                self.stats.errors += 1
+                traceback.print_exc()
+            delivered += 1
+            if budget is not None and self.clock() - start >= budget:
+                break
+        self.stats.delivered += delivered
+        if delivered:
+            self.stats.last_lag = lag
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+        return delivered
+
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def lag(self) -> float:
+        # Seconds the oldest waiting event has been queued
+        try:
+            item = self.queue[0]
+        except IndexError:
+            return 0.0
+        if isinstance(item, str):
+            event = self.latest.get(item)
+            if event is None:
+                return 0.0
+            item = event
+        return max(0.0, self.clock() - item.received_at)
+
+    def clear(self) -> None:
+        self.queue.clear()
+        self.latest.clear()
+        self.marked.clear()
@@ -0,0 +1,114 @@
+from event_bus import EventBus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain_all(bus, **options):
+    delivered = []
+    bus.drain(lambda event: delivered.append((event.name, event.data)), budget=None, **options)
+    return delivered
+
+
+def test_coalesced_events_keep_their_place_and_newest_payload():
+    bus = EventBus(clock=FakeClock())
+    bus.publish("countdown_update", 3)
+    bus.publish("package_drop", "crate")
+    bus.publish("countdown_update", 2)
+    bus.publish("countdown_update", 1)
+    assert bus.depth() == 2
+    assert drain_all(bus) == [("countdown_update", 1), ("package_drop", "crate")]
+    assert (bus.stats.published, bus.stats.coalesced, bus.stats.delivered) == (4, 2, 2)
+    # Once drained, the next tick queues a marker of its own
+    bus.publish("countdown_update", 0)
+    assert drain_all(bus) == [("countdown_update", 0)]
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    bus = EventBus(max_events=3, clock=FakeClock())
+    bus.publish("countdown_update", 9)
+    for drop in range(4):
+        bus.publish("package_drop", drop)
+    assert drain_all(bus) == [("package_drop", 1), ("package_drop", 2), ("package_drop", 3)]
+    assert bus.stats.dropped == 2 and bus.stats.max_depth == 3
+    # The dropped marker took its payload with it
+    assert bus.latest == {} and bus.marked == set()
+
+
+def test_drop_newest_keeps_the_oldest_events():
+    bus = EventBus(max_events=3, overflow="drop_newest", clock=FakeClock())
+    for drop in range(4):
+        bus.publish("package_drop", drop)
+    bus.publish("countdown_update", 9)
+    assert drain_all(bus) == [("package_drop", 0), ("package_drop", 1), ("package_drop", 2)]
+    assert bus.stats.dropped == 2
+    assert bus.latest == {} and bus.marked == set()
+
+
+def test_unknown_overflow_policy_is_rejected():
+    try:
+        EventBus(overflow="block")
+    except ValueError:
+        pass
+    else:
+        assert False, "expected ValueError"
+
+
+def test_drain_stops_at_the_frame_budget():
+    clock = FakeClock()
+    bus = EventBus(clock=clock)
+    for drop in range(5):
+        bus.publish("package_drop", drop)
+
+    def slow_handler(event):
+        clock.now += 0.003
+
+    assert bus.drain(slow_handler, budget=0.004) == 2
+    # A budget already spent still delivers one event, so the queue always moves
+    assert bus.drain(slow_handler, budget=0.0) == 1
+    assert bus.drain(slow_handler, budget=None, max_events=1) == 1
+    assert bus.depth() == 1
+
+
+def test_handler_errors_are_counted_and_skipped():
+    bus = EventBus(clock=FakeClock())
+    bus.publish("package_drop", "bad")
+    bus.publish("package_drop", "good")
+    delivered = []
+
+    def handler(event):
+        if event.data == "bad":
+            raise RuntimeError("broken callback")
+        delivered.append(event.data)
+
+    assert bus.drain(handler) == 2
+    assert delivered == ["good"]
+    assert bus.stats.errors == 1
+
+
+def test_lag_counts_from_the_oldest_unread_event():
+    clock = FakeClock()
+    bus = EventBus(clock=clock)
+    assert bus.lag() == 0.0
+    bus.publish("package_drop", "crate")
+    clock.now = 1.0
+    bus.publish("package_drop", "shield")
+    clock.now = 2.5
+    assert bus.lag() == 2.5
+    drain_all(bus)
+    assert (bus.stats.last_lag, bus.stats.max_lag) == (2.5, 2.5)
+    # A coalesced tick keeps the time of the first one nobody has read yet
+    clock.now = 3.0
+    bus.publish("countdown_update", 2)
+    clock.now = 4.0
+    bus.publish("countdown_update", 1)
+    clock.now = 5.0
+    assert bus.lag() == 2.0
+    drain_all(bus)
+    assert (bus.stats.last_lag, bus.stats.max_lag) == (2.0, 2.5)
+    assert bus.lag() == 0.0
@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+import constants as c
+from waypoint_path import WaypointPath
+
+#compiled levels sit next to their source with this extension added
+COMPILED_SUFFIX = ".tdlevel"
+LEVEL_MAGIC = b"TDLV"
+LEVEL_VERSION = 1
+#magic, version, width, height, tile size, waypoint count, source mtime, source size, source hash
+HEADER = struct.Struct("<4sHHHHHqq20s")
+#tile ids turrets can be built on
+BUILDABLE_TILES = (c.GRASS_TILE,)
+
+class LevelError(ValueError):
+  pass
+
+class Level():
+  """A level ready for World: tiles, buildable mask and precomputed path.
+
+  tile_map holds one byte per tile in row order and buildable one bit per
+  tile. The WaypointPath is built once per Level and shared by every World
+  made from it, so restarting only resets game state.
+  """
+  def __init__(self, width, height, tile_size, tile_map, waypoints, path = None, buildable = None):
+    self.width = width
+    self.height = height
+    self.tile_size = tile_size
+    self.tile_map = bytes(tile_map)
+    self.waypoints = [(float(x), float(y)) for x, y in waypoints]
+    self.path = path or WaypointPath(self.waypoints)
+    self.buildable = buildable if buildable is not None else buildable_mask(self.tile_map)
+    #indices of buildable tiles in row order, for bulk placement queries
+    self.buildable_tiles = [tile_num for tile_num in range(width * height) if self.buildable[tile_num >> 3] & (1 << (tile_num & 7))]
+
+  def is_buildable(self, tile_x, tile_y):
+    if not (0 <= tile_x < self.width and 0 <= tile_y < self.height):
+      return False
+    tile_num = tile_y * self.width + tile_x
+    return bool(self.buildable[tile_num >> 3] & (1 << (tile_num & 7)))
+
+def buildable_mask(tile_map):
+  mask = bytearray((len(tile_map) + 7) // 8)
+  for tile_num, tile in enumerate(tile_map):
+    if tile in BUILDABLE_TILES:
+      mask[tile_num >> 3] |= 1 << (tile_num & 7)
+  return bytes(mask)
+
+def validate(width, height, tiles, waypoints, tile_count = None):
+  if len(tiles) != width * height:
+    raise LevelError(f"tilemap has {len(tiles)} tiles, expected {width * height}")
+  for tile in tiles:
+    if not 0 <= tile <= 255:
+      raise LevelError(f"tile id {tile} does not fit in a byte")
+    if tile_count is not None and tile > tile_count:
+      raise LevelError(f"tile id {tile} is not in the tileset")
+  if len(waypoints) < 2:
+    raise LevelError("waypoint path needs at least two points")
+
+def parse_tmj(data):
+  """Build a Level from Tiled JSON (the parsed contents of a .tmj file)."""
+  tiles = None
+  waypoints = []
+  for layer in data["layers"]:
+    if layer["name"] == "tilemap":
+      tiles = layer["data"]
+    elif layer["name"] == "waypoints":
+      for obj in layer["objects"]:
+        #polyline points are relative to their object
+        for point in obj["polyline"]:
+          waypoints.append((obj.get("x", 0) + point["x"], obj.get("y", 0) + point["y"]))
+  if tiles is None:
+    raise LevelError("level has no tilemap layer")
+  validate(data["width"], data["height"], tiles, waypoints)
+  return Level(data["width"], data["height"], data["tilewidth"], tiles, waypoints)
+
+def tileset_count(tsx_path):
+  return int(ET.parse(tsx_path).getroot().get("tilecount"))
+
+def parse_tmx(path):
+  """Build a Level from Tiled XML, checking tile ids against the .tsx tileset."""
+  root = ET.parse(path).getroot()
+  width = int(root.get("width"))
+  height = int(root.get("height"))
+  tile_count = None
+  for tileset in root.findall("tileset"):
+    source = tileset.get("source")
+    if source:
+      tileset_path = os.path.join(os.path.dirname(path), source)
+      tile_count = int(tileset.get("firstgid")) - 1 + tileset_count(tileset_path)
+  tiles = None
+  waypoints = []
+  for layer in root.findall("layer"):
+    if layer.get("name") == "tilemap":
+      data = layer.find("data")
+      if data.get("encoding") != "csv":
+        raise LevelError("only csv encoded tile layers are supported")
+      tiles = [int(tile) for tile in data.text.replace("\n", "").split(",") if tile]
+  for group in root.findall("objectgroup"):
+    if group.get("name") == "waypoints":
+      for obj in group.findall("object"):
+        obj_x = float(obj.get("x", 0))
+        obj_y = float(obj.get("y", 0))
+        for point in obj.find("polyline").get("points").split():
+          x, y = point.split(",")
+          waypoints.append((obj_x + float(x), obj_y + float(y)))
+  if tiles is None:
+    raise LevelError("level has no tilemap layer")
+  validate(width, height, tiles, waypoints, tile_count)
+  return Level(width, height, int(root.get("tilewidth")), tiles, waypoints)
+
+def parse_source(path):
+  if path.endswith(".tmx"):
+    return parse_tmx(path)
+  with open(path) as file:
+    return parse_tmj(json.load(file))
+
+def source_files(path):
+  #a .tmx level also depends on the tilesets it references
+  files = [path]
+  if path.endswith(".tmx"):
+    for tileset in ET.parse(path).getroot().findall("tileset"):
+      if tileset.get("source"):
+        files.append(os.path.join(os.path.dirname(path), tileset.get("source")))
+  return files
+
+def source_stamp(path):
+  #newest mtime and total size of the source files, cheap to check on every load
+  stats = [os.stat(file) for file in source_files(path)]
+  return max(stat.st_mtime_ns for stat in stats), sum(stat.st_size for stat in stats)
+
+def source_hash(path):
+  digest = hashlib.sha1()
+  for file in source_files(path):
+    with open(file, "rb") as source:
+      digest.update(source.read())
+  return digest.digest()
+
+def encode(level, mtime, size, digest):
+  path = level.path
+  floats = array("d")
+  for x, y in path.points:
+    floats.extend((x, y))
+  floats.extend(path.distances)
+  for length, (dir_x, dir_y), angle in zip(path.lengths, path.directions, path.angles):
+    floats.extend((length, dir_x, dir_y, angle))
+  if sys.byteorder != "little":
+    floats.byteswap()
+  header = HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, level.width, level.height, level.tile_size, len(path.points), mtime, size, digest)
+  return header + level.tile_map + level.buildable + floats.tobytes()
+
+def decode(data):
+  """Return (level, mtime, size, hash) from a compiled level."""
+  magic, version, width, height, tile_size, point_count, mtime, size, digest = HEADER.unpack_from(data)
+  if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+    raise LevelError("not a compiled level of this version")
+  offset = HEADER.size
+  tile_map = data[offset:offset + width * height]
+  offset += width * height
+  mask_size = (width * height + 7) // 8
+  buildable = data[offset:offset + mask_size]
+  offset += mask_size
+  if (len(data) - offset) % 8:
+    raise LevelError("compiled level is truncated")
+  floats = array("d")
+  floats.frombytes(data[offset:])
+  if sys.byteorder != "little":
+    floats.byteswap()
+  if len(floats) != point_count * 3 + (point_count - 1) * 4:
+    raise LevelError("compiled level is truncated")
+  points = [(floats[i], floats[i + 1]) for i in range(0, point_count * 2, 2)]
+  distances = list(floats[point_count * 2:point_count * 3])
+  rows = [floats[i:i + 4] for i in range(point_count * 3, len(floats), 4)]
+  path = WaypointPath.from_arrays(points, distances, [row[0] for row in rows], [(row[1], row[2]) for row in rows], [row[3] for row in rows])
+  level = Level(width, height, tile_size, tile_map, points, path, buildable)
+  return level, mtime, size, digest
+
+def compiled_path(path):
+  return path + COMPILED_SUFFIX
+
+def write_file(path, data):
+  #write beside the target and swap it in, so a crash never leaves half a file
+  temp_path = f"{path}.{os.getpid()}.tmp"
+  try:
+    with open(temp_path, "wb") as file:
+      file.write(data)
+    os.replace(temp_path, path)
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+    raise
+
+def compile_level(path, output = None):
+  """Parse and validate a .tmj/.tmx level and write its compiled form."""
+  output = output or compiled_path(path)
+  mtime, size = source_stamp(path)
+  level = parse_source(path)
+  write_file(output, encode(level, mtime, size, source_hash(path)))
+  return level
+
+def read_compiled(path):
+  """Load the compiled form of a level, recompiling it if the source has changed.
+
+  An unchanged mtime and size is trusted as is. Otherwise the sources are
+  hashed, and only a different hash means they are parsed again; a touched
+  but identical file just has its stamp refreshed.
+  """
+  output = compiled_path(path)
+  mtime, size = source_stamp(path)
+  try:
+    with open(output, "rb") as file:
+      level, cached_mtime, cached_size, digest = decode(file.read())
+  except (OSError, struct.error, ValueError):
+    #missing, damaged or from another version, LevelError is a ValueError too
+    return compile_level(path, output)
+  if (cached_mtime, cached_size) == (mtime, size):
+    return level
+  if digest != source_hash(path):
+    return compile_level(path, output)
+  write_file(output, encode(level, mtime, size, digest))
+  return level
+
+#levels already loaded this session, with the source stamp they were loaded at
+loaded_levels = {}
+
+def load_level(path):
+  """Level for a .tmj/.tmx file, from memory, the compiled cache or the source."""
+  stamp = source_stamp(path)
+  cached = loaded_levels.get(path)
+  if cached is not None and cached[0] == stamp:
+    return cached[1]
+  try:
+    level = read_compiled(path)
+  except OSError:
+    #read-only install, parse the source every time
+    level = parse_source(path)
+  loaded_levels[path] = (stamp, level)
+  return level
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Compile Tiled levels into the binary level format")
+  parser.add_argument("levels", nargs = "+", help = ".tmj or .tmx level files")
+  args = parser.parse_args(argv)
+  for path in args.levels:
+    level = compile_level(path)
+    print(f"{path} -> {compiled_path(path)} ({level.width}x{level.height}, {len(level.waypoints)} waypoints)")
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit(main())
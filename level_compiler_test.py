@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+from level_compiler import compiled_path, compile_level, read_compiled
+
+LEVELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+def copy_level(directory):
+  #a .tmx level and its tileset, so the compiled file can be damaged freely
+  for name in ("level.tmx", "TD tileset.tsx"):
+    shutil.copy(os.path.join(LEVELS, name), directory)
+  return os.path.join(directory, "level.tmx")
+
+def test_damaged_compiled_level_is_recompiled():
+  with tempfile.TemporaryDirectory() as directory:
+    path = copy_level(directory)
+    level = compile_level(path)
+    output = compiled_path(path)
+    with open(output, "rb") as file:
+      data = file.read()
+    for damaged in (data[:-3], data[:-8], data[:10], b""):
+      with open(output, "wb") as file:
+        file.write(damaged)
+      reloaded = read_compiled(path)
+      assert reloaded.tile_map == level.tile_map
+      assert reloaded.waypoints == level.waypoints
+      with open(output, "rb") as file:
+        assert file.read() == data
+
+def test_compiling_leaves_no_temporary_files():
+  with tempfile.TemporaryDirectory() as directory:
+    path = copy_level(directory)
+    compile_level(path)
+    #a touched but unchanged source only has its stamp rewritten
+    os.utime(path, ns = (0, 0))
+    read_compiled(path)
+    assert sorted(os.listdir(directory)) == ["TD tileset.tsx", "level.tmx", "level.tmx.tdlevel"]
@@ -2,6 +2,7 @@ import pygame as pg
 import requests
 import threading
 from auth_service import VorldAuthService
+from text_cache import text_cache
 import argparse
 import os
 import hashlib
@@ -30,8 +31,12 @@ def run_login(screen):
     - Esc or window close to cancel (returns ('Player', ''))
     """
     clock = pg.time.Clock()
-    base_font = pg.font.SysFont("Consolas", 28)
-    title_font = pg.font.SysFont("Consolas", 36, bold=True)
+    # Fonts are created once, not inside the render loop
+    base_font = text_cache.font("Consolas", 28)
+    title_font = text_cache.font("Consolas", 36, bold=True)
+    error_font = text_cache.font("Consolas", 20)
+    btn_font = text_cache.font("Consolas", 24, bold=True)
+    loading_font = text_cache.font("Consolas", 20)
 
     # Overlay sizes
     screen_w, screen_h = screen.get_size()
@@ -215,21 +220,19 @@ def run_login(screen):
         pg.draw.rect(screen, pg.Color("#6c6c7a"), (box_x, box_y, box_w, box_h), width=2, border_radius=16)
 
         # Title and instructions
-        title_surf = title_font.render("Đăng nhập Vorld", True, pg.Color("#e6e6e6"))
+        title_surf = text_cache.render(title_font, "Đăng nhập Vorld", pg.Color("#e6e6e6"))
         screen.blit(title_surf, (box_x + 30, box_y + 24))
         
         # Hiển thị lỗi nếu có
         if api_response is not None and not api_response.get('success'):
-            error_font = pg.font.SysFont("Consolas", 20)
             error_msg = api_response.get('error', 'Đăng nhập thất bại')
-            error_text = error_font.render(f"Lỗi: {error_msg}", True, pg.Color("#ff5555"))
+            error_text = text_cache.render(error_font, f"Lỗi: {error_msg}", pg.Color("#ff5555"))
             screen.blit(error_text, (box_x + 30, box_y + 68))
         elif api_error is not None:
-            error_font = pg.font.SysFont("Consolas", 20)
-            error_text = error_font.render("Lỗi kết nối server!", True, pg.Color("#ff5555"))
+            error_text = text_cache.render(error_font, "Lỗi kết nối server!", pg.Color("#ff5555"))
             screen.blit(error_text, (box_x + 30, box_y + 68))
         else:
-            hint_surf = base_font.render("Nhập email và mật khẩu", True, pg.Color("#c8c8c8"))
+            hint_surf = text_cache.render(base_font, "Nhập email và mật khẩu", pg.Color("#c8c8c8"))
             screen.blit(hint_surf, (box_x + 30, box_y + 68))
 
         # Username field
@@ -237,9 +240,9 @@ def run_login(screen):
         pg.draw.rect(screen, pg.Color("#9aa0ff") if active_field == "user" else pg.Color("#808091"), 
                      user_rect, width=2, border_radius=8)
         if username:
-            user_surf = base_font.render(username, True, pg.Color("#ffffff"))
+            user_surf = text_cache.render(base_font, username, pg.Color("#ffffff"))
         else:
-            user_surf = base_font.render(user_placeholder, True, pg.Color("#9a9aa5"))
+            user_surf = text_cache.render(base_font, user_placeholder, pg.Color("#9a9aa5"))
         screen.blit(user_surf, (user_rect.x + 10, user_rect.y + 6))
 
         # Password field (masked)
@@ -247,7 +250,7 @@ def run_login(screen):
         pg.draw.rect(screen, pg.Color("#9aa0ff") if active_field == "pass" else pg.Color("#808091"), 
                      pass_rect, width=2, border_radius=8)
         masked = "*" * len(password) if password else pass_placeholder
-        pass_surf = base_font.render(masked, True, pg.Color("#ffffff") if password else pg.Color("#9a9aa5"))
+        pass_surf = text_cache.render(base_font, masked, pg.Color("#ffffff") if password else pg.Color("#9a9aa5"))
         screen.blit(pass_surf, (pass_rect.x + 10, pass_rect.y + 6))
 
         # Caret for active field
@@ -282,20 +285,18 @@ def run_login(screen):
         pg.draw.rect(screen, btn_color, button_rect, border_radius=10)
         pg.draw.rect(screen, pg.Color("#9aa0ff"), button_rect, width=2, border_radius=10)
         
-        btn_font = pg.font.SysFont("Consolas", 24, bold=True)
         if is_loading:
             # Hiển thị loading animation
             dots = "." * ((pg.time.get_ticks() // 500) % 4)
-            btn_text = btn_font.render(f"Đang xử lý{dots}", True, pg.Color("#ffffff"))
+            btn_text = text_cache.render(btn_font, f"Đang xử lý{dots}", pg.Color("#ffffff"))
         else:
-            btn_text = btn_font.render("Xác nhận", True, pg.Color("#ffffff"))
+            btn_text = text_cache.render(btn_font, "Xác nhận", pg.Color("#ffffff"))
         text_rect = btn_text.get_rect(center=button_rect.center)
         screen.blit(btn_text, text_rect)
         
         # Hiển thị trạng thái loading ở dưới nút
         if is_loading:
-            loading_font = pg.font.SysFont("Consolas", 20)
-            loading_text = loading_font.render("Đang kết nối đến server...", True, pg.Color("#ffaa00"))
+            loading_text = text_cache.render(loading_font, "Đang kết nối đến server...", pg.Color("#ffaa00"))
             loading_rect = loading_text.get_rect(center=(box_x + box_w // 2, button_y + button_h + 15))
             screen.blit(loading_text, loading_rect)
 
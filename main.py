@@ -1,9 +1,16 @@
 import pygame as pg
-import json
-from enemy import Enemy
-from world import World
-from turret import Turret
+import random
+from simulation import Simulation
+from assets import AssetManager
+from level_compiler import load_level
+from replay import ActionLog
 from button import Button
+from renderer import Renderer
+from profiler import FrameProfiler
+from rotation_cache import rotation_cache
+from text_cache import text_cache
+from turret import range_image, prewarm_range_images
+from entity import TURRET_STATS
 import constants as c
 from login import run_login
 
@@ -21,112 +28,121 @@ pg.display.set_caption("Tower Defence")
 player_name, _player_password = run_login(screen)
 
 #game variables
-game_over = False
-game_outcome = 0# -1 is loss & 1 is win
-level_started = False
-last_enemy_spawn = pg.time.get_ticks()
 placing_turrets = False
 selected_turret = None
 
-#load images
+#load images, sprites are packed into shared atlas surfaces as they load
+assets = AssetManager()
 #map
-map_image = pg.image.load('levels/level.png').convert_alpha()
-#turret spritesheets
-turret_spritesheets = []
-for x in range(1, c.TURRET_LEVELS + 1):
-  turret_sheet = pg.image.load(f'assets/images/turrets/turret_{x}.png').convert_alpha()
-  turret_spritesheets.append(turret_sheet)
+map_image = assets.image('levels/level.png', atlas = False)
+#turret animation frames, sliced once for every level
+turret_frames = assets.turret_frames()
 #individual turret image for mouse cursor
-cursor_turret = pg.image.load('assets/images/turrets/cursor_turret.png').convert_alpha()
+cursor_turret = assets.image('assets/images/turrets/cursor_turret.png')
 #enemies
-enemy_images = {
-  "weak": pg.image.load('assets/images/enemies/enemy_1.png').convert_alpha(),
-  "medium": pg.image.load('assets/images/enemies/enemy_2.png').convert_alpha(),
-  "strong": pg.image.load('assets/images/enemies/enemy_3.png').convert_alpha(),
-  "elite": pg.image.load('assets/images/enemies/enemy_4.png').convert_alpha()
-}
+enemy_images = assets.enemy_images()
 #buttons
-buy_turret_image = pg.image.load('assets/images/buttons/buy_turret.png').convert_alpha()
-cancel_image = pg.image.load('assets/images/buttons/cancel.png').convert_alpha()
-upgrade_turret_image = pg.image.load('assets/images/buttons/upgrade_turret.png').convert_alpha()
-begin_image = pg.image.load('assets/images/buttons/begin.png').convert_alpha()
-restart_image = pg.image.load('assets/images/buttons/restart.png').convert_alpha()
-fast_forward_image = pg.image.load('assets/images/buttons/fast_forward.png').convert_alpha()
+buy_turret_image = assets.image('assets/images/buttons/buy_turret.png')
+cancel_image = assets.image('assets/images/buttons/cancel.png')
+upgrade_turret_image = assets.image('assets/images/buttons/upgrade_turret.png')
+begin_image = assets.image('assets/images/buttons/begin.png')
+restart_image = assets.image('assets/images/buttons/restart.png')
+fast_forward_image = assets.image('assets/images/buttons/fast_forward.png')
 #gui
-heart_image = pg.image.load("assets/images/gui/heart.png").convert_alpha()
-coin_image = pg.image.load("assets/images/gui/coin.png").convert_alpha()
-logo_image = pg.image.load("assets/images/gui/logo.png").convert_alpha()
+heart_image = assets.image("assets/images/gui/heart.png")
+coin_image = assets.image("assets/images/gui/coin.png")
+logo_image = assets.image("assets/images/gui/logo.png")
 
 #load sounds
 shot_fx = pg.mixer.Sound('assets/audio/shot.wav')
 shot_fx.set_volume(0.5)
 
-#load json data for level
-with open('levels/level.tmj') as file:
-  world_data = json.load(file)
+#load the level, from its compiled form when the source has not changed
+world_data = load_level('levels/level.tmj')
 
 #load fonts for displaying text on the screen
-text_font = pg.font.SysFont("Consolas", 24, bold = True)
-large_font = pg.font.SysFont("Consolas", 36)
+text_font = text_cache.font("Consolas", 24, bold = True)
+large_font = text_cache.font("Consolas", 36)
 
 #function for outputting text onto the screen
 def draw_text(text, font, text_col, x, y):
-  img = font.render(text, True, text_col)
-  screen.blit(img, (x, y))
+  #text is only rasterised again when its value changes
+  img = text_cache.render(font, text, text_col)
+  renderer.blit(img, (x, y))
 
-def display_data():
+def create_background():
+  #compose everything that never changes during a game into one surface
+  background = pg.Surface(screen.get_size()).convert()
+  #draw level
+  world.draw(background)
   #draw panel
-  pg.draw.rect(screen, "maroon", (c.SCREEN_WIDTH, 0, c.SIDE_PANEL, c.SCREEN_HEIGHT))
-  pg.draw.rect(screen, "grey0", (c.SCREEN_WIDTH, 0, c.SIDE_PANEL, 400), 2)
-  screen.blit(logo_image, (c.SCREEN_WIDTH, 400))
+  pg.draw.rect(background, "maroon", (c.SCREEN_WIDTH, 0, c.SIDE_PANEL, c.SCREEN_HEIGHT))
+  pg.draw.rect(background, "grey0", (c.SCREEN_WIDTH, 0, c.SIDE_PANEL, 400), 2)
+  background.blit(logo_image, (c.SCREEN_WIDTH, 400))
+  background.blit(heart_image, (c.SCREEN_WIDTH + 10, 65))
+  background.blit(coin_image, (c.SCREEN_WIDTH + 10, 95))
+  return background
+
+def display_data():
   #display data
   draw_text("LEVEL: " + str(world.level), text_font, "grey100", c.SCREEN_WIDTH + 10, 10)
   # show player name under level
   draw_text("PLAYER: " + str(player_name), text_font, "grey100", c.SCREEN_WIDTH + 10, 35)
-  screen.blit(heart_image, (c.SCREEN_WIDTH + 10, 65))
   draw_text(str(world.health), text_font, "grey100", c.SCREEN_WIDTH + 50, 70)
-  screen.blit(coin_image, (c.SCREEN_WIDTH + 10, 95))
   draw_text(str(world.money), text_font, "grey100", c.SCREEN_WIDTH + 50, 100)
-  
+
 
 def create_turret(mouse_pos):
   mouse_tile_x = mouse_pos[0] // c.TILE_SIZE
   mouse_tile_y = mouse_pos[1] // c.TILE_SIZE
-  #calculate the sequential number of the tile
-  mouse_tile_num = (mouse_tile_y * c.COLS) + mouse_tile_x
-  #check if that tile is grass
-  if world.tile_map[mouse_tile_num] == 7:
-    #check that there isn't already a turret there
-    space_is_free = True
-    for turret in turret_group:
-      if (mouse_tile_x, mouse_tile_y) == (turret.tile_x, turret.tile_y):
-        space_is_free = False
-    #if it is a free space then create turret
-    if space_is_free == True:
-      new_turret = Turret(turret_spritesheets, mouse_tile_x, mouse_tile_y, shot_fx)
-      turret_group.add(new_turret)
-      #deduct cost of turret
-      world.money -= c.BUY_COST
+  sim.command("place_turret", mouse_tile_x, mouse_tile_y)
 
 def select_turret(mouse_pos):
   mouse_tile_x = mouse_pos[0] // c.TILE_SIZE
   mouse_tile_y = mouse_pos[1] // c.TILE_SIZE
-  for turret in turret_group:
-    if (mouse_tile_x, mouse_tile_y) == (turret.tile_x, turret.tile_y):
-      return turret
+  return sim.turret_at(mouse_tile_x, mouse_tile_y)
 
 def clear_selection():
-  for turret in turret_group:
+  for turret in sim.turret_group:
     turret.selected = False
 
-#create world
-world = World(world_data, map_image)
-world.process_data()
-world.process_enemies()
-
-#create groups
-enemy_group = pg.sprite.Group()
-turret_group = pg.sprite.Group()
+def draw_range_preview(mouse_pos):
+  #show the range a new turret would cover, or that of the unselected turret under the mouse
+  mouse_tile_x = mouse_pos[0] // c.TILE_SIZE
+  mouse_tile_y = mouse_pos[1] // c.TILE_SIZE
+  if placing_turrets:
+    #only where a click would place a turret: free grass on the map
+    if not sim.world.can_build(mouse_tile_x, mouse_tile_y):
+      return
+    radius = TURRET_STATS[0].range
+  else:
+    turret = sim.turret_at(mouse_tile_x, mouse_tile_y)
+    if turret is None or turret.selected:
+      return
+    radius = turret.range
+  image = range_image(radius)
+  rect = image.get_rect()
+  rect.center = ((mouse_tile_x + 0.5) * c.TILE_SIZE, (mouse_tile_y + 0.5) * c.TILE_SIZE)
+  renderer.blit(image, rect)
+
+#create simulation, which owns the world and the sprite groups
+#the seed and every player command are logged so the game can be replayed headlessly
+seed = random.getrandbits(32)
+action_log = ActionLog(seed)
+sim = Simulation(world_data, map_image, enemy_images, turret_frames, shot_fx, seed = seed, action_log = action_log)
+
+#enemies only ever face along a path segment, so rotate them for each heading up front
+for enemy_image in enemy_images.values():
+  rotation_cache.prewarm(enemy_image, sim.world.path.angles)
+prewarm_range_images()
+
+#the map and static panel are drawn once, each frame only redraws what changed
+world = sim.world
+renderer = Renderer(screen, create_background(), c.DIRTY_RENDERING)
+
+#time each phase of the frame, F3 shows the overlay, F4 records a trace, F5 runs cProfile
+profiler = FrameProfiler()
+sim.profiler = profiler
 
 #create buttons
 turret_button = Button(c.SCREEN_WIDTH + 30, 120, buy_turret_image, True)
@@ -140,26 +156,19 @@ fast_forward_button = Button(c.SCREEN_WIDTH + 50, 300, fast_forward_image, False
 run = True
 while run:
 
-  clock.tick(c.FPS)
-
   #########################
   # UPDATING SECTION
   #########################
 
-  if game_over == False:
-    #check if player has lost
-    if world.health <= 0:
-      game_over = True
-      game_outcome = -1 #loss
-    #check if player has won
-    if world.level > c.TOTAL_LEVELS:
-      game_over = True
-      game_outcome = 1 #win
+  frame_ms = clock.tick(c.FPS)
+  profiler.begin_frame()
 
-    #update groups
-    enemy_group.update(world)
-    turret_group.update(enemy_group, world)
+  #run the fixed simulation steps owed for the real time since the last frame
+  with profiler.phase("simulation"):
+    sim.advance(frame_ms)
+  world = sim.world
 
+  if sim.game_over == False:
     #highlight selected turret
     if selected_turret:
       selected_turret.selected = True
@@ -168,50 +177,43 @@ while run:
   # DRAWING SECTION
   #########################
 
-  #draw level
-  world.draw(screen)
+  #restore the level and panel behind last frame's drawing
+  with profiler.phase("world_draw"):
+    renderer.begin_frame()
 
   #draw groups
-  enemy_group.draw(screen)
-  for turret in turret_group:
-    turret.draw(screen)
-
-  display_data()
-
-  if game_over == False:
+  with profiler.phase("enemy_draw"):
+    sim.interpolate()
+    renderer.draw_group(sim.enemy_group)
+  with profiler.phase("turret_draw"):
+    for turret in sim.turret_group:
+      turret.draw(renderer)
+    mouse_pos = pg.mouse.get_pos()
+    if mouse_pos[0] < c.SCREEN_WIDTH and mouse_pos[1] < c.SCREEN_HEIGHT:
+      draw_range_preview(mouse_pos)
+
+  with profiler.phase("display_data"):
+    display_data()
+
+  if sim.game_over == False:
     #check if the level has been started or not
-    if level_started == False:
-      if begin_button.draw(screen):
-        level_started = True
+    if sim.level_started == False:
+      if begin_button.draw(renderer):
+        sim.command("begin_level")
     else:
       #fast forward option
-      world.game_speed = 1
-      if fast_forward_button.draw(screen):
-        world.game_speed = 2
-      #spawn enemies
-      if pg.time.get_ticks() - last_enemy_spawn > c.SPAWN_COOLDOWN:
-        if world.spawned_enemies < len(world.enemy_list):
-          enemy_type = world.enemy_list[world.spawned_enemies]
-          enemy = Enemy(enemy_type, world.waypoints, enemy_images)
-          enemy_group.add(enemy)
-          world.spawned_enemies += 1
-          last_enemy_spawn = pg.time.get_ticks()
-
-    #check if the wave is finished
-    if world.check_level_complete() == True:
-      world.money += c.LEVEL_COMPLETE_REWARD
-      world.level += 1
-      level_started = False
-      last_enemy_spawn = pg.time.get_ticks()
-      world.reset_level()
-      world.process_enemies()
+      game_speed = 1
+      if fast_forward_button.draw(renderer):
+        game_speed = c.FAST_FORWARD_SPEED
+      if game_speed != world.game_speed:
+        sim.command("set_game_speed", game_speed)
 
     #draw buttons
     #button for placing turrets
     #for the "turret button" show cost of turret and draw the button
     draw_text(str(c.BUY_COST), text_font, "grey100", c.SCREEN_WIDTH + 215, 135)
-    screen.blit(coin_image, (c.SCREEN_WIDTH + 260, 130))
-    if turret_button.draw(screen):
+    renderer.blit(coin_image, (c.SCREEN_WIDTH + 260, 130))
+    if turret_button.draw(renderer):
       placing_turrets = True
     #if placing turrets then show the cancel button as well
     if placing_turrets == True:
@@ -220,8 +222,8 @@ while run:
       cursor_pos = pg.mouse.get_pos()
       cursor_rect.center = cursor_pos
       if cursor_pos[0] <= c.SCREEN_WIDTH:
-        screen.blit(cursor_turret, cursor_rect)
-      if cancel_button.draw(screen):
+        renderer.blit(cursor_turret, cursor_rect)
+      if cancel_button.draw(renderer):
         placing_turrets = False
     #if a turret is selected then show the upgrade button
     if selected_turret:
@@ -229,36 +231,30 @@ while run:
       if selected_turret.upgrade_level < c.TURRET_LEVELS:
         #show cost of upgrade and draw the button
         draw_text(str(c.UPGRADE_COST), text_font, "grey100", c.SCREEN_WIDTH + 215, 195)
-        screen.blit(coin_image, (c.SCREEN_WIDTH + 260, 190))
-        if upgrade_button.draw(screen):
-          if world.money >= c.UPGRADE_COST:
-            selected_turret.upgrade()
-            world.money -= c.UPGRADE_COST
+        renderer.blit(coin_image, (c.SCREEN_WIDTH + 260, 190))
+        if upgrade_button.draw(renderer):
+          sim.command("upgrade_turret", selected_turret.tile_x, selected_turret.tile_y)
   else:
-    pg.draw.rect(screen, "dodgerblue", (200, 200, 400, 200), border_radius = 30)
-    if game_outcome == -1:
+    renderer.rect("dodgerblue", (200, 200, 400, 200), border_radius = 30)
+    if sim.game_outcome == -1:
       draw_text("GAME OVER", large_font, "grey0", 310, 230)
-    elif game_outcome == 1:
+    elif sim.game_outcome == 1:
       draw_text("YOU WIN!", large_font, "grey0", 315, 230)
     #restart level
-    if restart_button.draw(screen):
-      game_over = False
-      level_started = False
+    if restart_button.draw(renderer):
       placing_turrets = False
       selected_turret = None
-      last_enemy_spawn = pg.time.get_ticks()
-      world = World(world_data, map_image)
-      world.process_data()
-      world.process_enemies()
-      #empty groups
-      enemy_group.empty()
-      turret_group.empty()
+      sim.command("restart")
+      world = sim.world
 
   #event handler
   for event in pg.event.get():
     #quit program
     if event.type == pg.QUIT:
       run = False
+    #profiler hotkeys
+    if event.type == pg.KEYDOWN:
+      profiler.handle_key(event.key)
     #mouse click
     if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
       mouse_pos = pg.mouse.get_pos()
@@ -268,13 +264,24 @@ while run:
         selected_turret = None
         clear_selection()
         if placing_turrets == True:
-          #check if there is enough money for a turret
-          if world.money >= c.BUY_COST:
-            create_turret(mouse_pos)
+          create_turret(mouse_pos)
         else:
           selected_turret = select_turret(mouse_pos)
 
   #update display
-  pg.display.flip()
+  profiler.draw_overlay(renderer)
+  with profiler.phase("present"):
+    renderer.end_frame()
+  profiler.end_frame(enemies = len(sim.enemy_group), turrets = len(sim.turret_group))
+
+#write out anything the profiler was still recording
+if profiler.trace is not None:
+  profiler.toggle_trace()
+if profiler.profile is not None:
+  profiler.toggle_cprofile()
+
+#save the action log so this game can be replayed with replay.py
+action_log.finish(sim)
+action_log.save(c.REPLAY_FILE)
 
 pg.quit()
\ No newline at end of file
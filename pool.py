@@ -0,0 +1,46 @@
+class Pool():
+  """Free list of reusable instances of one class.
+
+  acquire() hands back a released instance after calling its reset() with
+  the same arguments the constructor takes, and only constructs a new one
+  when the free list is empty. Pooled objects get a pool attribute and call
+  pool.release(self) once they are finished with, typically from kill().
+  Any sprite with reset() can be pooled this way, such as enemies or short
+  lived effects, so heavy waves stop allocating once the pool is warm.
+  """
+  def __init__(self, factory, max_free = None):
+    self.factory = factory
+    #cap on the instances kept for reuse, None keeps everything released
+    self.max_free = max_free
+    self.free = []
+    self.created = 0
+    self.reused = 0
+
+  def __len__(self):
+    return len(self.free)
+
+  def acquire(self, *args):
+    if self.free:
+      obj = self.free.pop()
+      obj.reset(*args)
+      self.reused += 1
+      return obj
+    obj = self.factory(*args)
+    obj.pool = self
+    self.created += 1
+    return obj
+
+  def release(self, obj):
+    if self.max_free is None or len(self.free) < self.max_free:
+      self.free.append(obj)
+
+  def prefill(self, count, *args):
+    #build instances up front so the first wave does not allocate them
+    for _ in range(count - len(self.free)):
+      obj = self.factory(*args)
+      obj.pool = self
+      self.created += 1
+      self.free.append(obj)
+
+  def clear(self):
+    self.free.clear()
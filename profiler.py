@@ -0,0 +1,170 @@
+import contextlib
+import cProfile
+import csv
+import io
+import json
+import pstats
+import time
+from collections import deque
+import pygame as pg
+import constants as c
+from text_cache import text_cache
+
+#hotkeys handled by FrameProfiler.handle_key
+OVERLAY_KEY = pg.K_F3
+TRACE_KEY = pg.K_F4
+CPROFILE_KEY = pg.K_F5
+#frames between overlay text refreshes, so drawing it costs almost nothing
+OVERLAY_REFRESH = 15
+
+class NullProfiler():
+  """Stand-in used when nothing is being measured."""
+  def phase(self, name):
+    return _NULL_PHASE
+
+_NULL_PHASE = contextlib.nullcontext()
+
+class _Phase():
+  #reusable timer for one named phase, cheaper than a generator context manager
+  def __init__(self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+    self.start = 0
+
+  def __enter__(self):
+    self.start = time.perf_counter_ns()
+
+  def __exit__(self, *exc):
+    current = self.profiler.current
+    current[self.name] = current.get(self.name, 0) + time.perf_counter_ns() - self.start
+
+class FrameProfiler():
+  """Per-phase frame timings with rolling p50/p95/p99 statistics.
+
+  Wrap each part of the frame in `with profiler.phase(name):` between
+  begin_frame() and end_frame(). Phases entered several times in a frame,
+  such as simulation steps while fast forwarding, are summed. The overlay,
+  per-frame trace and cProfile session are toggled with F3, F4 and F5.
+  """
+  def __init__(self, window = c.PROFILER_WINDOW):
+    self.window = window
+    self.samples = {}
+    self.phases = {}
+    self.current = {}
+    self.counts = {}
+    self.frame = 0
+    self.frame_start = 0
+    self.show_overlay = False
+    self.overlay_image = None
+    self.trace = None
+    self.profile = None
+
+  def phase(self, name):
+    timer = self.phases.get(name)
+    if timer is None:
+      timer = self.phases[name] = _Phase(self, name)
+    return timer
+
+  def begin_frame(self):
+    self.current = {}
+    self.frame_start = time.perf_counter_ns()
+
+  def end_frame(self, **counts):
+    self.current["frame"] = time.perf_counter_ns() - self.frame_start
+    for name, elapsed in self.current.items():
+      samples = self.samples.get(name)
+      if samples is None:
+        samples = self.samples[name] = deque(maxlen = self.window)
+      samples.append(elapsed)
+    self.counts = counts
+    if self.trace is not None:
+      row = {"frame": self.frame}
+      row.update({f"{name}_ms": elapsed / 1e6 for name, elapsed in self.current.items()})
+      row.update(counts)
+      self.trace.append(row)
+    self.frame += 1
+
+  def percentiles(self, name):
+    #(p50, p95, p99) in milliseconds over the rolling window
+    samples = sorted(self.samples.get(name, ()))
+    if not samples:
+      return (0, 0, 0)
+    last = len(samples) - 1
+    return tuple(samples[int(last * q)] / 1e6 for q in (0.5, 0.95, 0.99))
+
+  def report(self):
+    return {name: self.percentiles(name) for name in self.samples}
+
+  def handle_key(self, key):
+    if key == OVERLAY_KEY:
+      self.show_overlay = not self.show_overlay
+    elif key == TRACE_KEY:
+      self.toggle_trace()
+    elif key == CPROFILE_KEY:
+      self.toggle_cprofile()
+
+  def toggle_trace(self, path = c.PROFILER_TRACE_FILE):
+    if self.trace is None:
+      self.trace = []
+      return None
+    trace = self.trace
+    self.trace = None
+    self.dump_trace(trace, path)
+    return path
+
+  def dump_trace(self, trace, path):
+    #JSON for .json paths, CSV otherwise
+    if path.endswith(".json"):
+      with open(path, "w") as file:
+        json.dump(trace, file)
+      return
+    columns = []
+    for row in trace:
+      for column in row:
+        if column not in columns:
+          columns.append(column)
+    with open(path, "w", newline = "") as file:
+      writer = csv.DictWriter(file, fieldnames = columns)
+      writer.writeheader()
+      writer.writerows(trace)
+
+  def toggle_cprofile(self, path = c.PROFILER_STATS_FILE):
+    if self.profile is None:
+      self.profile = cProfile.Profile()
+      self.profile.enable()
+      return None
+    self.profile.disable()
+    self.profile.dump_stats(path)
+    #print the hottest functions so a kiosk log shows them without extra tools
+    output = io.StringIO()
+    pstats.Stats(self.profile, stream = output).sort_stats("cumulative").print_stats(20)
+    print(output.getvalue())
+    self.profile = None
+    return path
+
+  def overlay_lines(self):
+    lines = [" ".join(f"{name}: {count}" for name, count in self.counts.items())]
+    if self.trace is not None:
+      lines.append(f"TRACE {len(self.trace)} frames")
+    if self.profile is not None:
+      lines.append("CPROFILE running")
+    for name in self.samples:
+      p50, p95, p99 = self.percentiles(name)
+      lines.append(f"{name:<12}{p50:6.2f}{p95:6.2f}{p99:6.2f} ms")
+    return lines
+
+  def draw_overlay(self, surface):
+    if not self.show_overlay:
+      return
+    if self.overlay_image is None or self.frame % OVERLAY_REFRESH == 0:
+      font = text_cache.font("Consolas", 14)
+      lines = [font.render(line, True, "grey100") for line in self.overlay_lines()]
+      width = max(line.get_width() for line in lines) + 10
+      height = sum(line.get_height() for line in lines) + 10
+      self.overlay_image = pg.Surface((width, height), pg.SRCALPHA)
+      self.overlay_image.fill((0, 0, 0, 170))
+      y = 5
+      for line in lines:
+        self.overlay_image.blit(line, (5, y))
+        y += line.get_height()
+    surface.blit(self.overlay_image, (5, 5))
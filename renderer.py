@@ -0,0 +1,57 @@
+import pygame as pg
+
+class Renderer():
+  """Draws a frame on top of a background that is composed once.
+
+  Everything drawn during a frame goes through blit()/rect() so the renderer
+  knows which areas changed. In dirty mode only those areas, plus the ones
+  drawn on the previous frame, are restored from the background and pushed
+  to the display with pg.display.update(rects). Otherwise the whole
+  background is blitted and the display flipped each frame.
+  """
+  def __init__(self, screen, background, dirty = True):
+    self.screen = screen
+    self.background = background
+    self.dirty = dirty
+    self.rects = []
+    self.last_rects = []
+    self.full_redraw = True
+
+  def set_background(self, background):
+    self.background = background
+    self.invalidate()
+
+  def invalidate(self):
+    #repaint and push the whole screen on the next frame
+    self.full_redraw = True
+
+  def begin_frame(self):
+    if self.full_redraw or not self.dirty:
+      self.screen.blit(self.background, (0, 0))
+    else:
+      #erase whatever was drawn last frame
+      for rect in self.last_rects:
+        self.screen.blit(self.background, rect, rect)
+
+  def blit(self, source, dest, area = None, special_flags = 0):
+    rect = self.screen.blit(source, dest, area, special_flags)
+    self.rects.append(rect)
+    return rect
+
+  def rect(self, color, rect, width = 0, border_radius = 0):
+    rect = pg.draw.rect(self.screen, color, rect, width, border_radius = border_radius)
+    self.rects.append(rect)
+    return rect
+
+  def draw_group(self, group):
+    for sprite in group:
+      self.blit(sprite.image, sprite.rect)
+
+  def end_frame(self):
+    if self.full_redraw or not self.dirty:
+      pg.display.flip()
+      self.full_redraw = False
+    else:
+      pg.display.update(self.last_rects + self.rects)
+    self.last_rects = self.rects
+    self.rects = []
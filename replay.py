@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+from simulation import Simulation
+from level_compiler import load_level
+
+REPLAY_VERSION = 1
+
+class ActionLog():
+  """Seed and timestamped player commands for one game.
+
+  Each entry records the simulation step it was issued before, the command
+  name and its arguments. Because the simulation runs on fixed steps and
+  draws all randomness from the seed, replaying the commands at the same
+  steps reproduces the game exactly.
+  """
+  def __init__(self, seed, actions = None, steps = 0, result = None):
+    self.seed = seed
+    self.actions = actions or []
+    self.steps = steps
+    self.result = result
+
+  def record(self, step, action, args):
+    self.actions.append({"step": step, "action": action, "args": list(args)})
+
+  def finish(self, sim):
+    #remember where the game stopped and how it ended so replays can be checked
+    self.steps = sim.steps
+    self.result = sim.summary()
+
+  def to_dict(self):
+    return {
+      "version": REPLAY_VERSION,
+      "seed": self.seed,
+      "steps": self.steps,
+      "actions": self.actions,
+      "result": self.result,
+    }
+
+  def save(self, path):
+    with open(path, "w") as file:
+      json.dump(self.to_dict(), file)
+
+  @classmethod
+  def load(cls, path):
+    with open(path) as file:
+      data = json.load(file)
+    if data.get("version") != REPLAY_VERSION:
+      raise ValueError(f"Unsupported replay version: {data.get('version')}")
+    return cls(data["seed"], data["actions"], data["steps"], data.get("result"))
+
+def run_replay(log, world_data):
+  """Re-run a recorded game headlessly as fast as possible and return the Simulation."""
+  sim = Simulation(world_data, seed = log.seed)
+  for entry in log.actions:
+    while sim.steps < entry["step"]:
+      sim.step()
+    sim.command(entry["action"], *entry["args"])
+  while sim.steps < log.steps:
+    sim.step()
+  return sim
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description = "Replay a recorded game headlessly and check its outcome")
+  parser.add_argument("replay", help = "Replay file written by the game")
+  parser.add_argument("--level", default = "levels/level.tmj", help = "Level the game was played on")
+  args = parser.parse_args(argv)
+
+  log = ActionLog.load(args.replay)
+  world_data = load_level(args.level)
+  result = run_replay(log, world_data).summary()
+  print(json.dumps(result, indent = 2))
+  if log.result is not None and result != log.result:
+    print("Replay does not match the recorded result:", file = sys.stderr)
+    print(json.dumps(log.result, indent = 2), file = sys.stderr)
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit(main())
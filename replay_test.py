@@ -0,0 +1,46 @@
+import os
+import json
+import random
+import tempfile
+import constants as c
+from replay import ActionLog, run_replay
+from simulation import Simulation
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level.tmj")
+
+with open(LEVEL) as file:
+  WORLD_DATA = json.load(file)
+
+def play_recorded(seed, frames):
+  """Play a game the way main.py does, with uneven frames and speed changes, recording it."""
+  log = ActionLog(seed)
+  sim = Simulation(WORLD_DATA, seed = seed, action_log = log)
+  clock = random.Random(seed)
+  grass = [tile_num for tile_num, tile in enumerate(sim.world.tile_map) if tile == 7]
+  tiles = [(tile_num % c.COLS, tile_num // c.COLS) for tile_num in grass[::11]]
+  for frame in range(frames):
+    if frame % 150 == 0 and tiles:
+      sim.command("place_turret", *tiles.pop())
+    if frame % 400 == 200:
+      for turret in list(sim.turret_group)[::2]:
+        sim.command("upgrade_turret", turret.tile_x, turret.tile_y)
+    if frame % 90 == 0:
+      sim.command("set_game_speed", clock.choice((1, 2, 3)))
+    if not sim.level_started:
+      sim.command("begin_level")
+    #real frame times wander, and some frames stall long enough to hit the catch-up cap
+    sim.advance(clock.choice((8, 16, 17, 33, 250)))
+    if sim.game_over:
+      break
+  log.finish(sim)
+  return log
+
+def test_replay_reproduces_recorded_game():
+  for seed in (4, 11):
+    log = play_recorded(seed, 1500)
+    assert log.result["level"] > 1
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "replay.json")
+      log.save(path)
+      loaded = ActionLog.load(path)
+    assert run_replay(loaded, WORLD_DATA).summary() == log.result
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Seconds a response is served without asking the server again, per endpoint
+DEFAULT_TTLS = {
+    "items_catalog": 300.0,
+    "game_details": 5.0,
+}
+
+
+@dataclass
+class CacheEntry:
+    result: Any
+    etag: Optional[str]
+    stored_at: float
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    # Conditional requests answered with 304 Not Modified
+    not_modified: int = 0
+    evictions: int = 0
+
+
+class ResponseCache:
+    """Size-bounded LRU of API responses with per-endpoint TTLs.
+
+    Keys are tuples whose first item names the endpoint, e.g.
+    ("game_details", game_id). lookup() classifies an entry as "fresh"
+    (younger than its TTL), "stale" (within stale_ttl after that, serve it
+    and revalidate in the background), "expired" (fetch again, but the ETag
+    can still be sent as If-None-Match) or "miss".
+
+    Each key has a generation that invalidate() bumps. Callers read it with
+    generation() before sending a request and pass it to store() and
+    touch(), which ignore responses that started before an invalidation so
+    an in-flight read cannot bring back data a write just replaced.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, *, default_ttl: float = 30.0, stale_ttl: float = 60.0, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.stats = CacheStats()
+        # Invalidation count per key, and for clear(), which invalidates everything
+        self.generations: Dict[Hashable, int] = {}
+        self.epoch = 0
+        # Lookups come from the caller while revalidations store from another thread
+        self.lock = threading.Lock()
+
+    def ttl_for(self, key: Tuple) -> float:
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def lookup(self, key: Tuple) -> Tuple[Optional[CacheEntry], str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None, "miss"
+            self.entries.move_to_end(key)
+            age = self.clock() - entry.stored_at
+            ttl = self.ttl_for(key)
+            if age < ttl:
+                self.stats.hits += 1
+                return entry, "fresh"
+            if age < ttl + self.stale_ttl:
+                self.stats.stale_hits += 1
+                return entry, "stale"
+            self.stats.misses += 1
+            return entry, "expired"
+
+    def generation(self, key: Tuple) -> Tuple[int, int]:
+        with self.lock:
+            return self.epoch, self.generations.get(key, 0)
+
+    def store(self, key: Tuple, result: Any, etag: Optional[str] = None, generation: Optional[Tuple[int, int]] = None) -> bool:
+        # Returns False when the response predates an invalidation and was dropped
+        with self.lock:
+            if generation is not None and generation != (self.epoch, self.generations.get(key, 0)):
+                return False
+            self.entries[key] = CacheEntry(result, etag, self.clock())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+            return True
+
+    def touch(self, key: Tuple, generation: Optional[Tuple[int, int]] = None) -> None:
+        # The server confirmed the cached copy is current
+        with self.lock:
+            if generation is not None and generation != (self.epoch, self.generations.get(key, 0)):
+                return
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.stored_at = self.clock()
+                self.stats.not_modified += 1
+
+    def invalidate(self, key: Tuple) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+            self.epoch += 1
+            self.stats = CacheStats()
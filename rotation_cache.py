@@ -0,0 +1,48 @@
+from collections import OrderedDict
+import pygame as pg
+import constants as c
+
+class RotationCache():
+  """Pre-rotated surfaces keyed by (source image, quantized angle).
+
+  Angles are snapped to a configurable resolution so many sprites facing
+  roughly the same way share one rotated surface, and the least recently
+  used entries are dropped once max_entries is reached.
+  """
+  def __init__(self, resolution = c.ROTATION_RESOLUTION, max_entries = c.ROTATION_CACHE_SIZE):
+    self.resolution = resolution
+    self.max_entries = max_entries
+    self.surfaces = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def quantize(self, angle):
+    #snap to the resolution and fold into [0, 360) so -180 and 180 share an entry
+    return (round(angle / self.resolution) * self.resolution) % 360
+
+  def get(self, image, angle):
+    key = (image, self.quantize(angle))
+    surface = self.surfaces.get(key)
+    if surface is not None:
+      self.hits += 1
+      self.surfaces.move_to_end(key)
+      return surface
+    self.misses += 1
+    surface = pg.transform.rotate(image, key[1])
+    self.surfaces[key] = surface
+    if len(self.surfaces) > self.max_entries:
+      self.surfaces.popitem(last = False)
+    return surface
+
+  def prewarm(self, image, angles):
+    #rotate ahead of time, e.g. for every heading along the enemy path
+    for angle in angles:
+      self.get(image, angle)
+
+  def clear(self):
+    self.surfaces.clear()
+    self.hits = 0
+    self.misses = 0
+
+#shared by every enemy and turret
+rotation_cache = RotationCache()
@@ -0,0 +1,78 @@
+import heapq
+
+class TurretScheduler():
+  """Wakes turrets only when they have something to do.
+
+  Each turret reports the simulated time after which its update() next
+  matters (Turret.next_update): the end of its cooldown, or the next
+  animation frame while firing. Sleeping turrets wait in a heap keyed on
+  that time, and turrets that are ready but found nothing in range wait in
+  a ready list checked every tick. Rescheduling a turret, for example after
+  an upgrade shortens its cooldown, leaves the old heap entry in place; it
+  is recognised as stale and skipped when popped.
+
+  Turrets woken on the same tick are updated in the order they were added,
+  which matches updating the whole sprite group.
+  """
+  def __init__(self):
+    self.heap = []
+    self.ready = []
+    #the wake time each turret is currently scheduled for, entries with any other time are stale
+    self.wake_times = {}
+    self.orders = {}
+    self.next_order = 0
+
+  def __len__(self):
+    return len(self.orders)
+
+  def add(self, turret, now):
+    self.orders[turret] = self.next_order
+    self.next_order += 1
+    self.schedule(turret, turret.next_update(now), now)
+
+  def remove(self, turret):
+    self.orders.pop(turret, None)
+    self.wake_times.pop(turret, None)
+
+  def reschedule(self, turret, now):
+    #call after changing a turret's cooldown or animation state
+    if turret in self.orders:
+      self.schedule(turret, turret.next_update(now), now)
+
+  def schedule(self, turret, wake_time, now):
+    self.wake_times[turret] = wake_time
+    entry = (wake_time, self.orders[turret], turret)
+    if wake_time <= now:
+      #due again on the very next tick, no need to go through the heap
+      self.ready.append(entry)
+    else:
+      heapq.heappush(self.heap, entry)
+
+  def clear(self):
+    self.heap.clear()
+    self.ready.clear()
+    self.wake_times.clear()
+    self.orders.clear()
+
+  def due(self, now):
+    #turrets whose wake time has passed, in the order they were added
+    due = []
+    wake_times = self.wake_times
+    for wake_time, order, turret in self.ready:
+      if wake_times.get(turret) == wake_time:
+        wake_times[turret] = None
+        due.append((order, turret))
+    self.ready = []
+    heap = self.heap
+    while heap and heap[0][0] < now:
+      wake_time, order, turret = heapq.heappop(heap)
+      if wake_times.get(turret) == wake_time:
+        wake_times[turret] = None
+        due.append((order, turret))
+    due.sort()
+    return due
+
+  def update(self, enemy_group, world, now, enemy_grid = None):
+    for order, turret in self.due(now):
+      turret.update(enemy_group, world, now, enemy_grid)
+      self.schedule(turret, turret.next_update(now), now)
@@ -0,0 +1,75 @@
+import os
+import json
+import random
+import pygame as pg
+import constants as c
+from simulation import Simulation
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level.tmj")
+WAVES = 5
+
+with open(LEVEL) as file:
+  WORLD_DATA = json.load(file)
+#distinct one pixel frames, so the frame each turret shows is part of the comparison
+FRAMES = [[pg.Surface((1, 1)) for step in range(c.ANIMATION_STEPS)] for level in range(c.TURRET_LEVELS)]
+
+class GroupUpdate():
+  """Reference scheduler: update every turret on every tick, in group order."""
+  def __init__(self, turret_group):
+    self.turret_group = turret_group
+
+  def add(self, turret, now):
+    pass
+
+  def remove(self, turret):
+    pass
+
+  def reschedule(self, turret, now):
+    pass
+
+  def clear(self):
+    pass
+
+  def update(self, enemy_group, world, now, enemy_grid = None):
+    for turret in self.turret_group.sprites():
+      turret.update(enemy_group, world, now, enemy_grid)
+
+def turret_state(sim):
+  #everything the wake-time rules could get wrong shows up in one of these
+  return [
+    (turret.tile_x, turret.tile_y, turret.upgrade_level, turret.last_shot, turret.update_time,
+     turret.frame_index, turret.animation_list.index(turret.original_image), turret.angle, turret.target is not None)
+    for turret in sim.turret_group
+  ]
+
+def play(reference, use_enemy_store, seed, dt_ms):
+  sim = Simulation(WORLD_DATA, turret_frames = FRAMES, seed = seed, use_enemy_store = use_enemy_store)
+  if reference:
+    sim.turret_scheduler = GroupUpdate(sim.turret_group)
+  sim.world.money = 10 ** 6
+  grass = [tile_num for tile_num, tile in enumerate(sim.world.tile_map) if tile == 7]
+  for tile_num in grass[::8]:
+    sim.command("place_turret", tile_num % c.COLS, tile_num // c.COLS)
+  for index, turret in enumerate(sim.turret_group.sprites()):
+    turret.targeting = ("order", "first", "last")[index % 3]
+  #upgrades land mid-cooldown and mid-animation, leaving stale heap entries behind
+  actions = random.Random(seed)
+  history = []
+  for wave in range(WAVES):
+    sim.begin_level()
+    while not sim.game_over and sim.world.level == wave + 1:
+      if actions.random() < 0.01:
+        turret = actions.choice(sim.turret_group.sprites())
+        sim.command("upgrade_turret", turret.tile_x, turret.tile_y)
+      sim.step(dt_ms)
+      if sim.steps % 25 == 0:
+        history.append((sim.summary(), turret_state(sim)))
+    if sim.game_over:
+      break
+  history.append((sim.summary(), turret_state(sim)))
+  return history
+
+def test_heap_scheduler_matches_group_update():
+  #steps shorter than ANIMATION_DELAY exercise the frame-just-advanced wake rule
+  for use_enemy_store, seed, dt_ms in ((False, 3, c.SIM_STEP_MS), (True, 8, c.SIM_STEP_MS), (False, 8, 5), (True, 3, 5)):
+    assert play(False, use_enemy_store, seed, dt_ms) == play(True, use_enemy_store, seed, dt_ms)
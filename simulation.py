@@ -0,0 +1,278 @@
+import random
+import pygame as pg
+from enemy import Enemy
+from world import World
+from turret import Turret
+from scheduler import TurretScheduler
+from pool import Pool
+from level_compiler import parse_tmj
+from spatial_grid import SpatialGrid
+from profiler import NullProfiler
+import constants as c
+
+class Simulation():
+  """Game rules without a window.
+
+  Owns the world and the sprite groups and advances them on a simulated
+  millisecond clock, so a wave can be played out as fast as the CPU allows.
+  advance() turns real frame time into fixed SIM_STEP_MS steps; fast
+  forward runs more of those steps per frame rather than bigger ones.
+  Passing no images (the default) gives a headless simulation that never
+  creates a display surface or loads any assets.
+
+  Player actions issued through command() are recorded to action_log when
+  one is given, and with a seed the whole game is reproducible.
+
+  With use_enemy_store the enemies are kept in a NumPy EnemyStore and moved
+  in one batched operation per tick instead of one Enemy.update per sprite.
+  """
+  def __init__(self, world_data, map_image = None, enemy_images = None, turret_frames = None, shot_fx = None, use_enemy_store = False, seed = None, action_log = None):
+    #a compiled Level, raw Tiled JSON is parsed once here rather than on every restart
+    if isinstance(world_data, dict):
+      world_data = parse_tmj(world_data)
+    self.world_data = world_data
+    self.map_image = map_image
+    self.enemy_images = enemy_images
+    #headless turrets keep one empty frame per step so firing takes as long as it does on screen
+    self.turret_frames = turret_frames or [[None] * c.ANIMATION_STEPS] * c.TURRET_LEVELS
+    self.shot_fx = shot_fx
+    self.headless = enemy_images is None
+    self.use_enemy_store = use_enemy_store
+    self.enemy_store = None
+    #every world created by this simulation draws its seed from here
+    self.rng = random.Random(seed)
+    self.action_log = action_log
+    #swap in a FrameProfiler to time each part of a step
+    self.profiler = NullProfiler()
+
+    #simulated time in milliseconds and the number of steps taken
+    self.ticks = 0
+    self.steps = 0
+    #simulated time owed to advance() and how far the next step it is, for drawing
+    self.accumulator = 0
+    self.alpha = 0
+    self.enemy_group = pg.sprite.Group()
+    #killed enemies are handed back here and reused by later spawns
+    self.enemy_pool = Pool(Enemy)
+    self.turret_group = pg.sprite.Group()
+    #wakes each turret only when its cooldown or animation frame is due
+    self.turret_scheduler = TurretScheduler()
+    #bucket live enemies by tile so turrets only scan nearby ones
+    self.enemy_grid = SpatialGrid()
+    self.reset()
+
+  def reset(self):
+    #game variables
+    self.game_over = False
+    self.game_outcome = 0# -1 is loss & 1 is win
+    self.level_started = False
+    self.last_enemy_spawn = self.ticks
+    #create world
+    self.world = World(self.world_data, self.map_image, self.rng.getrandbits(32))
+    self.world.process_data()
+    self.world.process_enemies()
+    #empty groups, pooled enemies still on the map go back for reuse
+    for enemy in self.enemy_group.sprites():
+      enemy.kill()
+    self.turret_group.empty()
+    self.turret_scheduler.clear()
+    if self.use_enemy_store:
+      #numpy is only needed when the batched store is asked for
+      from enemy_store import EnemyStore
+      self.enemy_store = EnemyStore(self.world.path)
+
+  def snapshot(self):
+    """Compact bytes holding the whole game state, see snapshot.take_snapshot."""
+    from snapshot import take_snapshot
+    return take_snapshot(self)
+
+  def restore(self, data):
+    from snapshot import restore_snapshot
+    restore_snapshot(self, data)
+
+  def fork(self):
+    #an independent copy of this game, sharing the level and images
+    other = Simulation(self.world_data, self.map_image, self.enemy_images, self.turret_frames, self.shot_fx, self.use_enemy_store)
+    other.restore(self.snapshot())
+    return other
+
+  def command(self, action, *args):
+    """Apply a player action by name and record it in the action log."""
+    if self.action_log is not None:
+      self.action_log.record(self.steps, action, args)
+    if action == "begin_level":
+      return self.begin_level()
+    elif action == "place_turret":
+      return self.create_turret(*args)
+    elif action == "upgrade_turret":
+      turret = self.turret_at(*args)
+      return turret is not None and self.upgrade_turret(turret)
+    elif action == "set_game_speed":
+      self.world.game_speed = args[0]
+    elif action == "restart":
+      return self.reset()
+    else:
+      raise ValueError(f"Unknown action: {action}")
+
+  def summary(self):
+    #plain values describing the game so far, used to compare replays
+    return {
+      "steps": self.steps,
+      "level": self.world.level,
+      "health": self.world.health,
+      "money": self.world.money,
+      "game_over": self.game_over,
+      "game_outcome": self.game_outcome,
+      "spawned_enemies": self.world.spawned_enemies,
+      "killed_enemies": self.world.killed_enemies,
+      "missed_enemies": self.world.missed_enemies,
+      "turrets": sorted([turret.tile_x, turret.tile_y, turret.upgrade_level] for turret in self.turret_group),
+    }
+
+  def begin_level(self):
+    self.level_started = True
+
+  def create_turret(self, tile_x, tile_y):
+    #check that the tile is free grass and there is enough money
+    if self.world.money < c.BUY_COST or not self.world.can_build(tile_x, tile_y):
+      return None
+    new_turret = Turret(self.turret_frames, tile_x, tile_y, self.shot_fx, self.ticks)
+    self.turret_group.add(new_turret)
+    self.world.place_turret(new_turret)
+    self.turret_scheduler.add(new_turret, self.ticks)
+    #deduct cost of turret
+    self.world.money -= c.BUY_COST
+    return new_turret
+
+  def turret_at(self, tile_x, tile_y):
+    return self.world.turret_at(tile_x, tile_y)
+
+  def remove_turret(self, turret):
+    turret.kill()
+    self.turret_scheduler.remove(turret)
+    self.world.remove_turret(turret)
+
+  def upgrade_turret(self, turret):
+    if turret.upgrade_level < c.TURRET_LEVELS and self.world.money >= c.UPGRADE_COST:
+      turret.upgrade()
+      #a shorter cooldown may make the turret ready sooner
+      self.turret_scheduler.reschedule(turret, self.ticks)
+      self.world.money -= c.UPGRADE_COST
+      return True
+    return False
+
+  def spawn_enemy(self, enemy_type):
+    if self.enemy_store:
+      enemy = self.enemy_store.spawn(enemy_type, self.enemy_images)
+    else:
+      enemy = self.enemy_pool.acquire(enemy_type, self.world.path, self.enemy_images)
+    self.enemy_group.add(enemy)
+    return enemy
+
+  def spawn_enemies(self):
+    if self.ticks - self.last_enemy_spawn > c.SPAWN_COOLDOWN:
+      if self.world.spawned_enemies < len(self.world.enemy_list):
+        enemy_type = self.world.enemy_list[self.world.spawned_enemies]
+        self.spawn_enemy(enemy_type)
+        self.world.spawned_enemies += 1
+        self.last_enemy_spawn = self.ticks
+
+  def advance(self, frame_ms):
+    """Run the fixed steps owed for frame_ms of real time.
+
+    world.game_speed multiplies the simulated time owed, so fast forward is
+    more steps per frame. Returns the number of steps taken.
+    """
+    self.accumulator += frame_ms * self.world.game_speed
+    steps = 0
+    while self.accumulator >= c.SIM_STEP_MS:
+      if steps >= c.MAX_STEPS_PER_FRAME:
+        #too far behind to catch up, drop the backlog instead of spiralling
+        self.accumulator = 0
+        break
+      self.step()
+      self.accumulator -= c.SIM_STEP_MS
+      steps += 1
+    self.alpha = self.accumulator / c.SIM_STEP_MS
+    return steps
+
+  def interpolate(self):
+    #place enemy rects between the last two steps for smooth drawing
+    if self.headless:
+      return
+    if self.enemy_store:
+      self.enemy_store.interpolate(self.alpha)
+    else:
+      for enemy in self.enemy_group:
+        enemy.interpolate(self.alpha)
+
+  def step(self, dt_ms = c.SIM_STEP_MS):
+    """Advance the game by one tick of dt_ms simulated milliseconds.
+
+    A step spawns at most one enemy and moves each turret animation on by at
+    most one frame, so a step longer than SIM_STEP_MS would play differently
+    from the same time taken in fixed steps. Those are rejected; use
+    advance() for arbitrary amounts of time.
+    """
+    if dt_ms > c.SIM_STEP_MS:
+      raise ValueError(f"Step of {dt_ms}ms is longer than SIM_STEP_MS ({c.SIM_STEP_MS}ms)")
+    self.ticks += dt_ms
+    self.steps += 1
+    if self.game_over:
+      return
+
+    world = self.world
+    world.step_scale = dt_ms / c.SIM_STEP_MS
+    #check if player has lost
+    if world.health <= 0:
+      self.game_over = True
+      self.game_outcome = -1 #loss
+    #check if player has won
+    if world.level > c.TOTAL_LEVELS:
+      self.game_over = True
+      self.game_outcome = 1 #win
+
+    #update groups
+    profiler = self.profiler
+    with profiler.phase("enemies"):
+      if self.enemy_store:
+        self.enemy_store.update(world)
+      else:
+        self.enemy_group.update(world)
+    with profiler.phase("grid"):
+      if self.turret_group:
+        self.enemy_grid.rebuild(self.enemy_group, self.enemy_store)
+    with profiler.phase("turrets"):
+      self.turret_scheduler.update(self.enemy_group, world, self.ticks, self.enemy_grid)
+    if self.game_over:
+      return
+
+    if self.level_started:
+      with profiler.phase("spawning"):
+        self.spawn_enemies()
+
+    #check if the wave is finished
+    if world.check_level_complete() == True:
+      world.money += c.LEVEL_COMPLETE_REWARD
+      world.level += 1
+      self.level_started = False
+      self.last_enemy_spawn = self.ticks
+      world.reset_level()
+      #there is no spawn data past the final level
+      if world.level <= c.TOTAL_LEVELS:
+        world.process_enemies()
+
+  def run_level(self, dt_ms = c.SIM_STEP_MS, max_steps = None):
+    """Start the current level and step until it is cleared or the game ends.
+
+    Returns True if the level was cleared.
+    """
+    level = self.world.level
+    self.begin_level()
+    steps = 0
+    while not self.game_over and self.world.level == level:
+      self.step(dt_ms)
+      steps += 1
+      if max_steps is not None and steps >= max_steps:
+        break
+    return self.world.level > level
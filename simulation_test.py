@@ -0,0 +1,35 @@
+import os
+import json
+import constants as c
+from simulation import Simulation
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level.tmj")
+
+with open(LEVEL) as file:
+  WORLD_DATA = json.load(file)
+
+def test_steps_longer_than_the_fixed_step_are_rejected():
+  sim = Simulation(WORLD_DATA, seed = 1)
+  try:
+    sim.step(c.SIM_STEP_MS * 4)
+  except ValueError:
+    pass
+  else:
+    assert False, "expected ValueError"
+  assert (sim.ticks, sim.steps) == (0, 0)
+
+def test_advance_matches_fixed_steps():
+  #one long frame is split into the same fixed steps as many short ones
+  stepped = Simulation(WORLD_DATA, seed = 1)
+  advanced = Simulation(WORLD_DATA, seed = 1)
+  for sim in (stepped, advanced):
+    sim.world.money = 10 ** 6
+    for tile_x, tile_y in sim.world.free_buildable_tiles()[::12]:
+      sim.command("place_turret", tile_x, tile_y)
+    sim.command("begin_level")
+  for _ in range(40 * 30):
+    stepped.step()
+  for _ in range(30):
+    advanced.advance(c.SIM_STEP_MS * 40)
+  assert advanced.summary() == stepped.summary()
+  assert advanced.summary()["killed_enemies"] > 0
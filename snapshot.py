@@ -0,0 +1,196 @@
+import struct
+import sys
+from array import array
+from entity import ENEMY_STATS
+from turret import Turret, TARGETING_MODES
+from world import World
+
+SNAPSHOT_MAGIC = b"TDSS"
+SNAPSHOT_VERSION = 1
+#enemy types are stored as their index in this tuple
+ENEMY_TYPES = tuple(ENEMY_STATS)
+
+#magic, version, ticks, steps, accumulator, last spawn, game over, outcome, level started,
+#world level, game speed, step scale, health, money, spawned, killed, missed,
+#spawn list length, enemy count, turret count
+HEADER = struct.Struct("<4sHdqdd?b?Hddiiiiiiii")
+#type, segment, distance, x, y, previous x, previous y, health, speed, angle
+ENEMY = struct.Struct("<BHdddddddd")
+#tile x, tile y, upgrade level, targeting, frame index, image frame, target,
+#last shot, animation update time, angle
+TURRET = struct.Struct("<HHBBBbiddd")
+#Mersenne Twister state is 624 words plus a position
+RNG_WORDS = 625
+RNG = struct.Struct("<?d")
+
+#target index for a turret still finishing its animation at an enemy that has left play
+LOST_TARGET = -2
+#turret.target for such a turret after a restore, only its truthiness is ever used
+FIRING = object()
+
+def pack_rng(rng):
+  version, state, gauss_next = rng.getstate()
+  words = array("I", state)
+  if sys.byteorder != "little":
+    words.byteswap()
+  return words.tobytes() + RNG.pack(gauss_next is not None, gauss_next or 0.0)
+
+def unpack_rng(rng, data, offset):
+  words = array("I")
+  words.frombytes(data[offset:offset + RNG_WORDS * 4])
+  if sys.byteorder != "little":
+    words.byteswap()
+  offset += RNG_WORDS * 4
+  has_gauss, gauss_next = RNG.unpack_from(data, offset)
+  rng.setstate((3, tuple(words), gauss_next if has_gauss else None))
+  return offset + RNG.size
+
+def take_snapshot(sim):
+  """Pack the complete state of a Simulation into bytes.
+
+  Covers the simulation clock and flags, both random generators, the world
+  counters, the spawn list and cursor, every enemy in group order and every
+  turret including where it is in its cooldown and firing animation. Images,
+  groups and the spatial grid are derived state and are rebuilt on restore.
+  """
+  world = sim.world
+  enemies = sim.enemy_group.sprites()
+  turrets = sim.turret_group.sprites()
+  parts = [HEADER.pack(
+    SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+    sim.ticks, sim.steps, sim.accumulator, sim.last_enemy_spawn,
+    sim.game_over, sim.game_outcome, sim.level_started,
+    world.level, world.game_speed, world.step_scale, world.health, world.money,
+    world.spawned_enemies, world.killed_enemies, world.missed_enemies,
+    len(world.enemy_list), len(enemies), len(turrets),
+  )]
+  parts.append(pack_rng(sim.rng))
+  parts.append(pack_rng(world.rng))
+  parts.append(bytes(ENEMY_TYPES.index(enemy_type) for enemy_type in world.enemy_list))
+  positions = {}
+  pack = ENEMY.pack
+  for index, enemy in enumerate(enemies):
+    positions[enemy] = index
+    pos = enemy.pos
+    if sim.enemy_store:
+      #the store looks segments up from distance each step, write the one a sprite would hold
+      prev_x, prev_y = sim.enemy_store.prev_pos[enemy.index]
+      segment = sim.enemy_store.path.segment_at(enemy.distance)
+      speed = sim.enemy_store.speed[enemy.index]
+    else:
+      prev_x, prev_y = enemy.prev_pos
+      segment = enemy.segment
+      speed = enemy.speed
+    parts.append(pack(
+      ENEMY_TYPES.index(enemy.enemy_type), segment, enemy.distance,
+      pos[0], pos[1], prev_x, prev_y, enemy.health, speed, enemy.angle,
+    ))
+  pack = TURRET.pack
+  for turret in turrets:
+    if turret.target is None:
+      target = -1
+    else:
+      target = positions.get(turret.target, LOST_TARGET)
+    image_frame = -1
+    for frame, image in enumerate(turret.animation_list):
+      if image is turret.original_image:
+        image_frame = frame
+        break
+    parts.append(pack(
+      turret.tile_x, turret.tile_y, turret.upgrade_level, TARGETING_MODES.index(turret.targeting),
+      turret.frame_index, image_frame, target, turret.last_shot, turret.update_time, turret.angle,
+    ))
+  return b"".join(parts)
+
+def restore_snapshot(sim, data):
+  """Put a Simulation into the state captured by take_snapshot.
+
+  The simulation must be playing the same level. Enemies come from its pool
+  or store and turrets are rebuilt against its own images, so a snapshot
+  taken headless can be restored into a drawn game and the other way round.
+  """
+  (magic, version, ticks, steps, accumulator, last_enemy_spawn, game_over, game_outcome, level_started,
+    level, game_speed, step_scale, health, money, spawned, killed, missed,
+    list_length, enemy_count, turret_count) = HEADER.unpack_from(data)
+  if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+    raise ValueError("not a snapshot of this version")
+  offset = HEADER.size
+
+  #clear out the current game, as a restart would
+  for enemy in sim.enemy_group.sprites():
+    enemy.kill()
+  sim.turret_group.empty()
+  sim.turret_scheduler.clear()
+  if sim.use_enemy_store:
+    from enemy_store import EnemyStore
+    sim.enemy_store = EnemyStore(sim.world_data.path)
+
+  sim.ticks = ticks
+  sim.steps = steps
+  sim.accumulator = accumulator
+  sim.last_enemy_spawn = last_enemy_spawn
+  sim.game_over = game_over
+  sim.game_outcome = game_outcome
+  sim.level_started = level_started
+  offset = unpack_rng(sim.rng, data, offset)
+
+  world = World(sim.world_data, sim.map_image)
+  world.process_data()
+  offset = unpack_rng(world.rng, data, offset)
+  world.level = level
+  world.game_speed = game_speed
+  world.step_scale = step_scale
+  world.health = health
+  world.money = money
+  world.spawned_enemies = spawned
+  world.killed_enemies = killed
+  world.missed_enemies = missed
+  world.enemy_list = [ENEMY_TYPES[index] for index in data[offset:offset + list_length]]
+  offset += list_length
+  sim.world = world
+
+  enemies = []
+  store = sim.enemy_store
+  for values in ENEMY.iter_unpack(data[offset:offset + enemy_count * ENEMY.size]):
+    type_index, segment, distance, x, y, prev_x, prev_y, enemy_health, speed, angle = values
+    enemy = sim.spawn_enemy(ENEMY_TYPES[type_index])
+    if store:
+      index = enemy.index
+      store.distance[index] = distance
+      store.pos[index] = (x, y)
+      store.prev_pos[index] = (prev_x, prev_y)
+      store.health[index] = enemy_health
+      store.speed[index] = speed
+      store.angle[index] = angle
+    else:
+      enemy.segment = segment
+      enemy.distance = distance
+      enemy.pos.update(x, y)
+      enemy.prev_pos.update(prev_x, prev_y)
+      enemy.health = enemy_health
+      enemy.speed = speed
+      enemy.angle = angle
+    if enemy.original_image is not None:
+      enemy.rotate()
+    enemies.append(enemy)
+  offset += enemy_count * ENEMY.size
+
+  for values in TURRET.iter_unpack(data[offset:offset + turret_count * TURRET.size]):
+    tile_x, tile_y, upgrade_level, targeting, frame_index, image_frame, target, last_shot, update_time, angle = values
+    turret = Turret(sim.turret_frames, tile_x, tile_y, sim.shot_fx, ticks)
+    while turret.upgrade_level < upgrade_level:
+      turret.upgrade()
+    turret.targeting = TARGETING_MODES[targeting]
+    turret.frame_index = frame_index
+    if image_frame >= 0:
+      turret.original_image = turret.animation_list[image_frame]
+    if target >= 0:
+      turret.target = enemies[target]
+    elif target == LOST_TARGET:
+      turret.target = FIRING
+    turret.last_shot = last_shot
+    turret.update_time = update_time
+    turret.angle = angle
+    sim.turret_group.add(turret)
+    world.place_turret(turret)
+    sim.turret_scheduler.add(turret, ticks)
@@ -0,0 +1,75 @@
+import os
+import pygame as pg
+import constants as c
+from level_compiler import load_level
+from simulation import Simulation
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level.tmj")
+#distinct one pixel frames, so the frame each turret shows goes through the snapshot
+FRAMES = [[pg.Surface((1, 1)) for step in range(c.ANIMATION_STEPS)] for level in range(c.TURRET_LEVELS)]
+
+def mid_wave_game(use_enemy_store):
+  """A game partway into its third wave with upgraded turrets in every targeting mode."""
+  sim = Simulation(load_level(LEVEL), turret_frames = FRAMES, seed = 5, use_enemy_store = use_enemy_store)
+  level = sim.world_data
+  sim.world.money = 10 ** 6
+  for tile_num in level.buildable_tiles[::10]:
+    sim.command("place_turret", tile_num % level.width, tile_num // level.width)
+  for index, turret in enumerate(sim.turret_group.sprites()):
+    turret.targeting = ("order", "first", "last")[index % 3]
+    for upgrade in range(index % c.TURRET_LEVELS):
+      sim.command("upgrade_turret", turret.tile_x, turret.tile_y)
+  sim.run_level()
+  sim.run_level()
+  sim.begin_level()
+  for _ in range(400):
+    sim.step()
+  #stop while a turret is part way through firing
+  while not any(turret.target for turret in sim.turret_group):
+    sim.step()
+  assert len(sim.enemy_group) > 0 and not sim.game_over
+  return sim
+
+def step(sim, count):
+  for _ in range(count):
+    sim.step()
+
+def test_fork_plays_on_identically():
+  for use_enemy_store in (False, True):
+    sim = mid_wave_game(use_enemy_store)
+    fork = sim.fork()
+    assert fork.snapshot() == sim.snapshot()
+    step(sim, 600)
+    step(fork, 600)
+    assert fork.snapshot() == sim.snapshot()
+    assert fork.summary() == sim.summary()
+
+def test_rollback_replays_identically():
+  for use_enemy_store in (False, True):
+    sim = mid_wave_game(use_enemy_store)
+    saved = sim.snapshot()
+    step(sim, 600)
+    ahead = sim.snapshot()
+    sim.restore(saved)
+    assert sim.snapshot() == saved
+    step(sim, 600)
+    assert sim.snapshot() == ahead
+
+def test_restore_across_enemy_backends():
+  sprites = mid_wave_game(False)
+  store = Simulation(sprites.world_data, turret_frames = FRAMES, use_enemy_store = True)
+  store.restore(sprites.snapshot())
+  step(sprites, 600)
+  step(store, 600)
+  assert store.summary() == sprites.summary()
+
+def test_store_snapshot_round_trips_through_sprites():
+  store = mid_wave_game(True)
+  #the store keeps no segment cursor, yet its snapshot must match the sprite game's
+  assert store.snapshot() == mid_wave_game(False).snapshot()
+  sprites = Simulation(store.world_data, turret_frames = FRAMES)
+  sprites.restore(store.snapshot())
+  assert sprites.snapshot() == store.snapshot()
+  step(sprites, 600)
+  step(store, 600)
+  assert sprites.snapshot() == store.snapshot()
@@ -0,0 +1,95 @@
+import constants as c
+
+#below this many live enemies a straight scan beats walking grid cells
+LINEAR_SCAN_LIMIT = 8
+
+class SpatialGrid():
+  """Uniform grid of live enemies bucketed by tile.
+
+  Rebuilt once per tick so turrets only look at the cells that overlap their
+  range. Each bucket keeps enemies in group order, which lets queries return
+  the same target as a plain scan of the group would.
+  """
+  def __init__(self, cell_size = c.TILE_SIZE):
+    self.cell_size = cell_size
+    self.cells = {}
+    self.live = []
+
+  def rebuild(self, enemy_group, enemy_store = None):
+    #positions are copied out as plain floats, they cannot change before the turrets run
+    self.cells = {}
+    size = self.cell_size
+    if enemy_store is not None:
+      #read every slot's position in one pass instead of per sprite
+      xs = enemy_store.pos[:, 0].tolist()
+      ys = enemy_store.pos[:, 1].tolist()
+      health = enemy_store.health
+      self.live = [(enemy, xs[enemy.index], ys[enemy.index]) for enemy in enemy_group if health[enemy.index] > 0]
+    else:
+      self.live = [(enemy, enemy.pos[0], enemy.pos[1]) for enemy in enemy_group if enemy.health > 0]
+    for order, (enemy, x, y) in enumerate(self.live):
+      key = (int(x // size), int(y // size))
+      cell = self.cells.get(key)
+      if cell is None:
+        self.cells[key] = [(order, enemy, x, y)]
+      else:
+        cell.append((order, enemy, x, y))
+
+  def query(self, x, y, radius):
+    #return the buckets of every cell overlapping the circle's bounding box
+    size = self.cell_size
+    min_col = int((x - radius) // size)
+    max_col = int((x + radius) // size)
+    min_row = int((y - radius) // size)
+    max_row = int((y + radius) // size)
+    cells = self.cells
+    #with a sparse grid it is cheaper to walk the occupied cells than the box
+    if (max_col - min_col + 1) * (max_row - min_row + 1) > len(cells):
+      return [cell for (col, row), cell in cells.items()
+              if min_col <= col <= max_col and min_row <= row <= max_row]
+    buckets = []
+    for col in range(min_col, max_col + 1):
+      for row in range(min_row, max_row + 1):
+        cell = cells.get((col, row))
+        if cell:
+          buckets.append(cell)
+    return buckets
+
+  def first_in_range(self, x, y, radius):
+    #find the earliest enemy in group order that is strictly inside the range
+    radius_sq = radius * radius
+    if len(self.live) <= LINEAR_SCAN_LIMIT:
+      for enemy, enemy_x, enemy_y in self.live:
+        x_dist = enemy_x - x
+        y_dist = enemy_y - y
+        if x_dist * x_dist + y_dist * y_dist < radius_sq and enemy.health > 0:
+          return enemy
+      return None
+    best_order = None
+    best_enemy = None
+    for cell in self.query(x, y, radius):
+      for order, enemy, enemy_x, enemy_y in cell:
+        #buckets are in group order, so nothing later in this one can win
+        if best_order is not None and order > best_order:
+          break
+        x_dist = enemy_x - x
+        y_dist = enemy_y - y
+        #health may have dropped since the rebuild if another turret fired this tick
+        if x_dist * x_dist + y_dist * y_dist < radius_sq and enemy.health > 0:
+          best_order = order
+          best_enemy = enemy
+          break
+    return best_enemy
+
+  def in_range(self, x, y, radius):
+    #every live enemy strictly inside the range, in group order like a plain scan
+    radius_sq = radius * radius
+    found = []
+    for cell in self.query(x, y, radius):
+      for order, enemy, enemy_x, enemy_y in cell:
+        x_dist = enemy_x - x
+        y_dist = enemy_y - y
+        if x_dist * x_dist + y_dist * y_dist < radius_sq and enemy.health > 0:
+          found.append((order, enemy))
+    found.sort(key = lambda item: item[0])
+    return [enemy for order, enemy in found]
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+import pygame as pg
+
+class TextCache():
+  """Fonts created once and rendered text surfaces reused between frames.
+
+  Surfaces are keyed by (font, text, colour, antialias), so a HUD value is
+  only rasterised again when it actually changes. Old values are dropped
+  least recently used first once max_entries is reached.
+  """
+  def __init__(self, max_entries = 256):
+    self.max_entries = max_entries
+    self.fonts = {}
+    self.surfaces = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def font(self, name, size, bold = False, italic = False):
+    key = (name, size, bold, italic)
+    font = self.fonts.get(key)
+    if font is None:
+      font = pg.font.SysFont(name, size, bold = bold, italic = italic)
+      self.fonts[key] = font
+    return font
+
+  def render(self, font, text, colour, antialias = True):
+    #pg.Color is not hashable, so key on its components
+    if isinstance(colour, pg.Color):
+      colour = tuple(colour)
+    key = (font, text, colour, antialias)
+    surface = self.surfaces.get(key)
+    if surface is not None:
+      self.hits += 1
+      self.surfaces.move_to_end(key)
+      return surface
+    self.misses += 1
+    surface = font.render(text, antialias, colour)
+    self.surfaces[key] = surface
+    if len(self.surfaces) > self.max_entries:
+      self.surfaces.popitem(last = False)
+    return surface
+
+  def clear(self):
+    self.surfaces.clear()
+    self.hits = 0
+    self.misses = 0
+
+#shared by the game HUD and the login screen
+text_cache = TextCache()
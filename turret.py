@@ -1,17 +1,51 @@
 import pygame as pg
 import math
 import constants as c
-from turret_data import TURRET_DATA
+from entity import SlottedSprite, TURRET_STATS
+from rotation_cache import rotation_cache
 
-class Turret(pg.sprite.Sprite):
-  def __init__(self, sprite_sheets, tile_x, tile_y, shot_fx):
-    pg.sprite.Sprite.__init__(self)
+#targeting modes: "order" shoots the first enemy in group order, "first" the one
+#furthest along the path and "last" the one that has travelled the least
+TARGETING_MODES = ("order", "first", "last")
+
+#transparent range circles keyed by radius, shared by every turret and the placement preview
+range_images = {}
+
+def range_image(radius):
+  image = range_images.get(radius)
+  if image is None:
+    image = pg.Surface((radius * 2, radius * 2))
+    image.fill((0, 0, 0))
+    image.set_colorkey((0, 0, 0))
+    pg.draw.circle(image, "grey100", (radius, radius), radius)
+    image.set_alpha(100)
+    range_images[radius] = image
+  return image
+
+def prewarm_range_images():
+  #one circle per upgrade level, drawn before the first turret is placed
+  for stats in TURRET_STATS:
+    range_image(stats.range)
+
+class Turret(SlottedSprite):
+  __slots__ = (
+    "upgrade_level", "range", "cooldown", "last_shot", "selected", "target", "targeting",
+    "tile_x", "tile_y", "x", "y", "shot_fx",
+    "animation_frames", "animation_list", "frame_index", "update_time",
+    "angle", "original_image", "image_key", "image", "rect", "range_image", "range_rect",
+  )
+
+  def __init__(self, animation_frames, tile_x, tile_y, shot_fx, now = 0):
+    SlottedSprite.__init__(self)
     self.upgrade_level = 1
-    self.range = TURRET_DATA[self.upgrade_level - 1].get("range")
-    self.cooldown = TURRET_DATA[self.upgrade_level - 1].get("cooldown")
-    self.last_shot = pg.time.get_ticks()
+    stats = TURRET_STATS[self.upgrade_level - 1]
+    self.range = stats.range
+    self.cooldown = stats.cooldown
+    #all timings are in simulated milliseconds supplied by the caller
+    self.last_shot = now
     self.selected = False
     self.target = None
+    self.targeting = "order"
 
     #position variables
     self.tile_x = tile_x
@@ -22,100 +56,135 @@ class Turret(pg.sprite.Sprite):
     #shot sound effect
     self.shot_fx = shot_fx
 
-    #animation variables
-    self.sprite_sheets = sprite_sheets
-    self.animation_list = self.load_images(self.sprite_sheets[self.upgrade_level - 1])
+    #animation variables, one frame list per upgrade level shared by every turret
+    self.animation_frames = animation_frames
+    self.animation_list = self.animation_frames[self.upgrade_level - 1]
     self.frame_index = 0
-    self.update_time = pg.time.get_ticks()
+    self.update_time = now
 
     #update image
     self.angle = 90
     self.original_image = self.animation_list[self.frame_index]
-    self.image = pg.transform.rotate(self.original_image, self.angle)
-    self.rect = self.image.get_rect()
+    #sprite sheet frame and quantized angle the current image was made from
+    self.image_key = None
+    if self.original_image:
+      self.image_key = (self.original_image, rotation_cache.quantize(self.angle - 90))
+      self.image = rotation_cache.get(*self.image_key)
+      self.rect = self.image.get_rect()
+    else:
+      self.image = None
+      self.rect = pg.Rect(0, 0, 0, 0)
     self.rect.center = (self.x, self.y)
 
-    #create transparent circle showing range
-    self.range_image = pg.Surface((self.range * 2, self.range * 2))
-    self.range_image.fill((0, 0, 0))
-    self.range_image.set_colorkey((0, 0, 0))
-    pg.draw.circle(self.range_image, "grey100", (self.range, self.range), self.range)
-    self.range_image.set_alpha(100)
+    #transparent circle showing range
+    self.range_image = None
+    self.range_rect = None
+    if self.original_image:
+      self.set_range_image()
+
+  def set_range_image(self):
+    self.range_image = range_image(self.range)
     self.range_rect = self.range_image.get_rect()
-    self.range_rect.center = self.rect.center
-
-  def load_images(self, sprite_sheet):
-    #extract images from spritesheet
-    size = sprite_sheet.get_height()
-    animation_list = []
-    for x in range(c.ANIMATION_STEPS):
-      temp_img = sprite_sheet.subsurface(x * size, 0, size, size)
-      animation_list.append(temp_img)
-    return animation_list
-
-  def update(self, enemy_group, world):
+    self.range_rect.center = (self.x, self.y)
+
+  def update(self, enemy_group, world, now, enemy_grid = None):
     #if target picked, play firing animation
     if self.target:
-      self.play_animation()
+      self.play_animation(now)
     else:
       #search for new target once turret has cooled down
-      if pg.time.get_ticks() - self.last_shot > (self.cooldown / world.game_speed):
-        self.pick_target(enemy_group)
+      if now - self.last_shot > self.cooldown:
+        self.pick_target(enemy_group, enemy_grid)
 
-  def pick_target(self, enemy_group):
+  def next_update(self, now):
+    #simulated time after which update() next has something to do
+    if self.target:
+      if self.update_time == now:
+        #the frame that just advanced becomes the image on the following tick
+        return now
+      return self.update_time + c.ANIMATION_DELAY
+    if now - self.last_shot > self.cooldown:
+      #cooled down but nothing was in range, look again next tick
+      return now
+    return self.last_shot + self.cooldown
+
+  def pick_target(self, enemy_group, enemy_grid = None):
     #find an enemy to target
-    x_dist = 0
-    y_dist = 0
+    if self.targeting == "order":
+      target = self.first_in_range(enemy_group, enemy_grid)
+    else:
+      if enemy_grid is not None:
+        in_range = enemy_grid.in_range(self.x, self.y, self.range)
+      else:
+        in_range = self.enemies_in_range(enemy_group)
+      #progress along the path is a single number, so first/last is a plain max/min;
+      #both keep the earliest enemy in group order on a tie
+      if self.targeting == "first":
+        target = max(in_range, key = lambda enemy: enemy.distance, default = None)
+      else:
+        target = min(in_range, key = lambda enemy: enemy.distance, default = None)
+    if target:
+      self.target = target
+      self.angle = math.degrees(math.atan2(-(target.pos[1] - self.y), target.pos[0] - self.x))
+      #damage enemy
+      self.target.health -= c.DAMAGE
+      #play sound effect
+      if self.shot_fx:
+        self.shot_fx.play()
+
+  def first_in_range(self, enemy_group, enemy_grid = None):
+    #the first enemy in group order that is in range
+    if enemy_grid is not None:
+      return enemy_grid.first_in_range(self.x, self.y, self.range)
+    for enemy in self.enemies_in_range(enemy_group):
+      return enemy
+    return None
+
+  def enemies_in_range(self, enemy_group):
     #check distance to each enemy to see if it is in range
+    range_sq = self.range * self.range
     for enemy in enemy_group:
       if enemy.health > 0:
         x_dist = enemy.pos[0] - self.x
         y_dist = enemy.pos[1] - self.y
-        dist = math.sqrt(x_dist ** 2 + y_dist ** 2)
-        if dist < self.range:
-          self.target = enemy
-          self.angle = math.degrees(math.atan2(-y_dist, x_dist))
-          #damage enemy
-          self.target.health -= c.DAMAGE
-          #play sound effect
-          self.shot_fx.play()
-          break
-
-  def play_animation(self):
+        if x_dist * x_dist + y_dist * y_dist < range_sq:
+          yield enemy
+
+  def play_animation(self, now):
     #update image
     self.original_image = self.animation_list[self.frame_index]
     #check if enough time has passed since the last update
-    if pg.time.get_ticks() - self.update_time > c.ANIMATION_DELAY:
-      self.update_time = pg.time.get_ticks()
+    if now - self.update_time > c.ANIMATION_DELAY:
+      self.update_time = now
       self.frame_index += 1
       #check if the animation has finished and reset to idle
       if self.frame_index >= len(self.animation_list):
         self.frame_index = 0
         #record completed time and clear target so cooldown can begin
-        self.last_shot = pg.time.get_ticks()
+        self.last_shot = now
         self.target = None
 
   def upgrade(self):
     self.upgrade_level += 1
-    self.range = TURRET_DATA[self.upgrade_level - 1].get("range")
-    self.cooldown = TURRET_DATA[self.upgrade_level - 1].get("cooldown")
+    stats = TURRET_STATS[self.upgrade_level - 1]
+    self.range = stats.range
+    self.cooldown = stats.cooldown
     #upgrade turret image
-    self.animation_list = self.load_images(self.sprite_sheets[self.upgrade_level - 1])
+    self.animation_list = self.animation_frames[self.upgrade_level - 1]
     self.original_image = self.animation_list[self.frame_index]
 
     #upgrade range circle
-    self.range_image = pg.Surface((self.range * 2, self.range * 2))
-    self.range_image.fill((0, 0, 0))
-    self.range_image.set_colorkey((0, 0, 0))
-    pg.draw.circle(self.range_image, "grey100", (self.range, self.range), self.range)
-    self.range_image.set_alpha(100)
-    self.range_rect = self.range_image.get_rect()
-    self.range_rect.center = self.rect.center
+    if self.original_image:
+      self.set_range_image()
 
   def draw(self, surface):
-    self.image = pg.transform.rotate(self.original_image, self.angle - 90)
-    self.rect = self.image.get_rect()
-    self.rect.center = (self.x, self.y)
+    #only fetch a new image when the frame or the quantized angle has changed
+    image_key = (self.original_image, rotation_cache.quantize(self.angle - 90))
+    if image_key != self.image_key:
+      self.image_key = image_key
+      self.image = rotation_cache.get(*image_key)
+      self.rect = self.image.get_rect()
+      self.rect.center = (self.x, self.y)
     surface.blit(self.image, self.rect)
     if self.selected:
       surface.blit(self.range_image, self.range_rect)
\ No newline at end of file
@@ -0,0 +1,60 @@
+import constants as c
+from spatial_grid import SpatialGrid
+from turret import Turret
+
+#headless turrets, one empty frame per animation step
+FRAMES = [[None] * c.ANIMATION_STEPS] * c.TURRET_LEVELS
+
+class FakeWorld():
+  game_speed = 1
+
+class FakeEnemy():
+  #only what targeting reads
+  def __init__(self, name, x, y, distance, health = 100):
+    self.name = name
+    self.pos = (x, y)
+    self.distance = distance
+    self.health = health
+
+def make_turret(targeting):
+  #centred on (264, 264) with a range of 90
+  turret = Turret(FRAMES, 5, 5, None)
+  turret.targeting = targeting
+  return turret
+
+def pick(turret, enemies, use_grid):
+  grid = None
+  if use_grid:
+    grid = SpatialGrid()
+    grid.rebuild(enemies)
+  turret.pick_target(enemies, grid)
+  return turret.target.name if turret.target else None
+
+def test_first_and_last_with_nothing_in_range():
+  enemies = [FakeEnemy("far", 600, 600, 50), FakeEnemy("dead", 264, 264, 10, health = 0)]
+  for targeting in ("first", "last"):
+    for use_grid in (False, True):
+      assert pick(make_turret(targeting), enemies, use_grid) is None
+
+def test_update_without_grid_finds_nothing():
+  turret = make_turret("first")
+  turret.update([FakeEnemy("far", 600, 600, 50)], FakeWorld(), turret.cooldown + 1)
+  assert turret.target is None
+
+def test_first_and_last_pick_by_distance():
+  enemies = [
+    FakeEnemy("middle", 250, 264, 40),
+    FakeEnemy("ahead", 280, 250, 70),
+    FakeEnemy("behind", 270, 290, 20),
+    FakeEnemy("out_of_range", 500, 264, 99),
+  ]
+  for use_grid in (False, True):
+    assert pick(make_turret("first"), enemies, use_grid) == "ahead"
+    assert pick(make_turret("last"), enemies, use_grid) == "behind"
+
+def test_ties_resolve_in_group_order_on_both_paths():
+  #the earlier enemy sits in a later grid cell, so cell order would pick the other one
+  enemies = [FakeEnemy("earlier", 300, 264, 100), FakeEnemy("later", 230, 264, 100)]
+  for targeting in ("first", "last"):
+    assert pick(make_turret(targeting), enemies, False) == "earlier"
+    assert pick(make_turret(targeting), enemies, True) == "earlier"
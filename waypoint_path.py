@@ -0,0 +1,62 @@
+import bisect
+import math
+
+class WaypointPath():
+  """Waypoint polyline with precomputed arc lengths.
+
+  Stores cumulative distance at every waypoint plus the unit direction,
+  length and heading of each segment, so anything following the path only
+  needs to track a single distance travelled. Headings use the same
+  convention as the sprites: degrees counter-clockwise with screen y down.
+  """
+  def __init__(self, waypoints):
+    self.points = [(float(x), float(y)) for x, y in waypoints]
+    self.distances = [0.0]
+    self.lengths = []
+    self.directions = []
+    self.angles = []
+    for (x1, y1), (x2, y2) in zip(self.points, self.points[1:]):
+      x_dist = x2 - x1
+      y_dist = y2 - y1
+      length = math.sqrt(x_dist * x_dist + y_dist * y_dist)
+      if length:
+        self.directions.append((x_dist / length, y_dist / length))
+      else:
+        self.directions.append((0.0, 0.0))
+      self.lengths.append(length)
+      self.angles.append(math.degrees(math.atan2(-y_dist, x_dist)))
+      self.distances.append(self.distances[-1] + length)
+    self.length = self.distances[-1]
+    self.segment_count = len(self.lengths)
+
+  @classmethod
+  def from_arrays(cls, points, distances, lengths, directions, angles):
+    #rebuild a path that was precomputed earlier, such as one read from a compiled level
+    path = cls.__new__(cls)
+    path.points = points
+    path.distances = distances
+    path.lengths = lengths
+    path.directions = directions
+    path.angles = angles
+    path.length = distances[-1]
+    path.segment_count = len(lengths)
+    return path
+
+  def segment_at(self, distance, segment = None):
+    #with a cursor from the previous lookup this is O(1) for anything moving forwards
+    if segment is None:
+      segment = bisect.bisect_right(self.distances, distance) - 1
+    else:
+      while segment + 1 < self.segment_count and distance >= self.distances[segment + 1]:
+        segment += 1
+    return min(max(segment, 0), self.segment_count - 1)
+
+  def position_at(self, distance, segment = None):
+    segment = self.segment_at(distance, segment)
+    x, y = self.points[segment]
+    dir_x, dir_y = self.directions[segment]
+    along = distance - self.distances[segment]
+    return (x + dir_x * along, y + dir_y * along)
+
+  def angle_at(self, distance, segment = None):
+    return self.angles[self.segment_at(distance, segment)]
@@ -4,14 +4,21 @@ import constants as c
 from enemy_data import ENEMY_SPAWN_DATA
 
 class World():
-  def __init__(self, data, map_image):
+  def __init__(self, level, map_image, seed = None):
     self.level = 1
+    #per-world random generator so a seed reproduces the same enemy order
+    self.rng = random.Random(seed)
     self.game_speed = 1
+    #how far a simulation step moves things relative to a fixed SIM_STEP_MS step
+    self.step_scale = 1
     self.health = c.HEALTH
     self.money = c.MONEY
     self.tile_map = []
+    #turret standing on each tile in row order, None where the tile is free
+    self.occupancy = []
     self.waypoints = []
-    self.level_data = data
+    self.path = None
+    self.level_data = level
     self.image = map_image
     self.enemy_list = []
     self.spawned_enemies = 0
@@ -19,21 +26,43 @@ class World():
     self.missed_enemies = 0
 
   def process_data(self):
-    #look through data to extract relevant info
-    for layer in self.level_data["layers"]:
-      if layer["name"] == "tilemap":
-        self.tile_map = layer["data"]
-      elif layer["name"] == "waypoints":
-        for obj in layer["objects"]:
-          waypoint_data = obj["polyline"]
-          self.process_waypoints(waypoint_data)
-
-  def process_waypoints(self, data):
-    #iterate through waypoints to extract individual sets of x and y coordinates
-    for point in data:
-      temp_x = point.get("x")
-      temp_y = point.get("y")
-      self.waypoints.append((temp_x, temp_y))
+    #the level was parsed and its path precomputed once, every world made from it shares them
+    self.tile_map = self.level_data.tile_map
+    self.occupancy = [None] * len(self.tile_map)
+    self.waypoints = self.level_data.waypoints
+    self.path = self.level_data.path
+
+  def turret_at(self, tile_x, tile_y):
+    if not (0 <= tile_x < self.level_data.width and 0 <= tile_y < self.level_data.height):
+      return None
+    return self.occupancy[tile_y * self.level_data.width + tile_x]
+
+  def can_build(self, tile_x, tile_y):
+    #grass with nothing on it yet
+    return self.level_data.is_buildable(tile_x, tile_y) and self.occupancy[tile_y * self.level_data.width + tile_x] is None
+
+  def place_turret(self, turret):
+    self.occupancy[turret.tile_y * self.level_data.width + turret.tile_x] = turret
+
+  def remove_turret(self, turret):
+    tile_num = turret.tile_y * self.level_data.width + turret.tile_x
+    if self.occupancy[tile_num] is turret:
+      self.occupancy[tile_num] = None
+
+  def free_buildable_tiles(self):
+    #(tile_x, tile_y) of every grass tile without a turret, in row order
+    width = self.level_data.width
+    occupancy = self.occupancy
+    return [(tile_num % width, tile_num // width) for tile_num in self.level_data.buildable_tiles if occupancy[tile_num] is None]
+
+  def turrets_within(self, tile_x, tile_y, tiles):
+    #turrets no more than tiles away along either axis, in row order
+    width = self.level_data.width
+    turrets = []
+    for y in range(max(tile_y - tiles, 0), min(tile_y + tiles + 1, self.level_data.height)):
+      row = self.occupancy[y * width + max(tile_x - tiles, 0):y * width + min(tile_x + tiles + 1, width)]
+      turrets.extend(turret for turret in row if turret is not None)
+    return turrets
 
   def process_enemies(self):
     enemies = ENEMY_SPAWN_DATA[self.level - 1]
@@ -42,7 +71,7 @@ class World():
       for enemy in range(enemies_to_spawn):
         self.enemy_list.append(enemy_type)
     #now randomize the list to shuffle the enemies
-    random.shuffle(self.enemy_list)
+    self.rng.shuffle(self.enemy_list)
 
   def check_level_complete(self):
     if (self.killed_enemies + self.missed_enemies) == len(self.enemy_list):